@@ -0,0 +1,27 @@
+"""
+orjson when it is installed, stdlib json otherwise.
+
+`loads` takes bytes or str; `dumps` always returns bytes and serializes NumPy
+arrays/scalars (as orjson does with OPT_SERIALIZE_NUMPY).
+"""
+try:
+    import orjson
+
+    loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+except ImportError:
+    import json
+
+    loads = json.loads
+
+    def _default(o):
+        if hasattr(o, "tolist"):
+            return o.tolist()
+        raise TypeError(f"Type is not JSON serializable: {type(o).__name__}")
+
+    def dumps(obj) -> bytes:
+        # ensure_ascii=False: non-ASCII (emoji in messages) stays unescaped UTF-8, like orjson
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
@@ -0,0 +1,16 @@
+"""
+Optional numba.
+
+`njit` compiles with numba when it is installed; without it the decorator is a
+no-op and the kernels run as plain Python (same results, just slower).
+"""
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def wrap(fn):
+            return fn
+        return wrap
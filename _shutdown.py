@@ -0,0 +1,18 @@
+"""
+SIGTERM as a normal exit.
+
+systemd stops a service with SIGTERM, whose default action ends the process
+without running atexit hooks (journal.flush_all, trade_events.flush_all).
+`install()` turns SIGTERM into SystemExit, so asyncio.run() unwinds its tasks
+and finally blocks and the hooks run before the process exits.
+"""
+import signal
+import sys
+
+
+def _exit(signum, frame):
+    sys.exit(0)
+
+
+def install() -> None:
+    signal.signal(signal.SIGTERM, _exit)
@@ -0,0 +1,16 @@
+"""
+Optional uvloop.
+
+`install()` makes asyncio.run() use uvloop's event loop when it is installed;
+without it (e.g. on Windows) the default asyncio loop is kept.
+"""
+import asyncio
+
+
+def install() -> bool:
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
@@ -1,7 +1,5 @@
 import asyncio
-import json
 import time
-import httpx
 import websockets
 
 from config import (
@@ -18,8 +16,11 @@ from config import (
     TP1_R_MULT, TP1_FRACTION, TP_SLIPPAGE_PCT, BE_BUFFER_PCT
 )
 
-from indicators import ema
-from pivots import last_confirmed_swing_low, last_confirmed_swing_high
+from _fastjson import dumps as json_dumps
+import _uvloop
+from ws_feed import all_mids_price, mid_needle
+from candles import NS, CandleBuilder, aggregate_closes, bootstrap_candles
+from indicators import EmaTracker, bar_features
 from risk import RiskState, size_from_risk
 from paper import PaperPosition, mark_to_market_pnl
 from logger import log
@@ -37,46 +38,6 @@ ATR_LEN = 14
 TP2_R_MULT = 2.0
 
 
-class CandleBuilder:
-    def __init__(self, tf_seconds: int):
-        self.tf = tf_seconds
-        self.current = None  # dict
-        self.candles = []    # list of dicts
-
-    def _bucket(self, ts: float) -> int:
-        return int(ts // self.tf) * self.tf
-
-    def update(self, ts: float, price: float):
-        b = self._bucket(ts)
-        if self.current is None or self.current["t"] != b:
-            if self.current is not None:
-                self.candles.append(self.current)
-            self.current = {"t": b, "o": price, "h": price, "l": price, "c": price}
-        else:
-            self.current["h"] = max(self.current["h"], price)
-            self.current["l"] = min(self.current["l"], price)
-            self.current["c"] = price
-
-    def last_closed(self):
-        return self.candles[-1] if self.candles else None
-
-
-def atr_from_candles(candles, length=14):
-    if len(candles) < length + 1:
-        return None
-    trs = []
-    for i in range(-length, 0):
-        c = candles[i]
-        prev = candles[i - 1]
-        tr = max(
-            c["h"] - c["l"],
-            abs(c["h"] - prev["c"]),
-            abs(c["l"] - prev["c"]),
-        )
-        trs.append(tr)
-    return sum(trs) / len(trs)
-
-
 class StructureState:
     def __init__(self):
         self.bosLevelLong = None
@@ -89,58 +50,28 @@ class StructureState:
         self.accCountShort = 0
 
 
-async def bootstrap_candles(symbol: str, tf_seconds: int, limit: int = 300):
-    interval = "5m"
-    url = "https://api.hyperliquid.xyz/info"
-    payload = {
-        "type": "candleSnapshot",
-        "req": {
-            "coin": symbol,
-            "interval": interval,
-            "startTime": int((time.time() - limit * tf_seconds) * 1000),
-            "endTime": int(time.time() * 1000),
-        }
-    }
-
-    async with httpx.AsyncClient(timeout=15) as client:
-        r = await client.post(url, json=payload)
-        r.raise_for_status()
-        candles = r.json()
-
-    out = []
-    for c in candles:
-        out.append({
-            "t": int(c["t"] // 1000),
-            "o": float(c["o"]),
-            "h": float(c["h"]),
-            "l": float(c["l"]),
-            "c": float(c["c"]),
-        })
-    return out
-
-
 async def main():
     risk = RiskState()
     structure = StructureState()
 
     candle_5m = CandleBuilder(TF_SECONDS)
     candle_1h = CandleBuilder(ONE_HOUR)
+    ema_fast5, ema_slow5 = EmaTracker(EMA_FAST), EmaTracker(EMA_SLOW)
+    ema_fast1, ema_slow1 = EmaTracker(EMA_FAST), EmaTracker(EMA_SLOW)
 
     position = None
-    last_candle_t = None
 
     # --- bootstrap historical candles (5m) ---
     history = await bootstrap_candles(SYMBOL, TF_SECONDS, limit=300)
-    if history:
-        candle_5m.candles = history[:-1]
-        candle_5m.current = history[-1]
-        last_candle_t = candle_5m.candles[-1]["t"] if candle_5m.candles else None
+    if len(history):
+        candle_5m.seed(history)
 
-        # build initial 1H history from bootstrapped 5m closes
-        for c in candle_5m.candles[-240:]:  # last ~20 hours
-            candle_1h.update(c["t"] + TF_SECONDS, c["c"])
+        # build initial 1H history from bootstrapped 5m closes (last ~20 hours)
+        closed_t = history.t[:-1][-240:]
+        closed_c = history.c[:-1][-240:]
+        candle_1h.seed(aggregate_closes(closed_t + TF_SECONDS, closed_c, ONE_HOUR))
 
-    log({"event": "bootstrapped", "candles_5m": len(candle_5m.candles), "candles_1h": len(candle_1h.candles)})
+    log({"event": "bootstrapped", "candles_5m": len(candle_5m), "candles_1h": len(candle_1h)})
 
     sub_msg = {"method": "subscribe", "subscription": {"type": "allMids"}}
     log({"event": "startup", "ws": WS_URL, "symbol": SYMBOL, "mode": "paper"})
@@ -148,47 +79,50 @@ async def main():
     while True:
         try:
             log({"event": "ws_connecting"})
-            async with websockets.connect(WS_URL, ping_interval=20, ping_timeout=20) as ws:
+            async with websockets.connect(
+                WS_URL, ping_interval=20, ping_timeout=20, compression=None,
+                # ticks are handled inline: let bursts queue instead of pausing the socket read
+                max_queue=1024, max_size=2**22,
+            ) as ws:
                 log({"event": "ws_connected"})
-                await ws.send(json.dumps(sub_msg))
+                await ws.send(json_dumps(sub_msg).decode())
                 log({"event": "ws_subscribed"})
 
+                last_price = None
+                last_bucket = None
+                needle = mid_needle(SYMBOL)
                 while True:
-                    msg = await ws.recv()
-                    data = json.loads(msg)
-
-                    if data.get("channel") != "allMids":
+                    # raw frame bytes straight into the parser: no str decode pass
+                    msg = await ws.recv(decode=False)
+                    # only our coin's mid is needed: slice it out instead of parsing every coin
+                    price_b = all_mids_price(msg, needle)
+                    if price_b is None:
                         continue
 
-                    payload = data.get("data", {})
-                    mids = payload.get("mids", {})
-                    if SYMBOL not in mids:
-                        continue
+                    price = float(price_b)
+                    ts_ns = time.time_ns()
 
-                    price = float(mids[SYMBOL])
-                    ts = time.time()
-
-                    # Update 5m builder
-                    candle_5m.update(ts, price)
-
-                    closed = candle_5m.last_closed()
-                    if not closed:
+                    # same price inside the same bar can't change anything
+                    b = candle_5m.bucket(ts_ns)
+                    if b == last_bucket and price == last_price:
                         continue
+                    last_bucket = b
+                    last_price = price
 
-                    # New 5m close?
-                    if closed["t"] == last_candle_t:
+                    # Update 5m builder; only a tick that closes a 5m bar goes further
+                    if not candle_5m.update(ts_ns, price):
                         continue
-                    last_candle_t = closed["t"]
+                    closed = candle_5m.last_closed()
 
                     log({
                         "event": "candle_closed",
                         "candle_time": closed["t"],
                         "close": closed["c"],
-                        "candles_built": len(candle_5m.candles)
+                        "candles_built": len(candle_5m)
                     })
 
                     # Build 1H from 5m closes
-                    candle_1h.update(closed["t"] + TF_SECONDS, closed["c"])
+                    candle_1h.update((closed["t"] + TF_SECONDS) * NS, closed["c"])
 
                     # ---- circuit breakers ----
                     if risk.daily_pnl <= -DAILY_MAX_LOSS_USDT:
@@ -280,22 +214,21 @@ async def main():
                         continue  # flat-only entries
 
                     # ---- ENTRY LOGIC (FLAT ONLY) ----
-                    if len(candle_5m.candles) < 120 or len(candle_1h.candles) < 40:
-                        log({"event": "waiting_data", "candles_5m": len(candle_5m.candles), "candles_1h": len(candle_1h.candles)})
+                    if len(candle_5m) < 120 or len(candle_1h) < 40:
+                        log({"event": "waiting_data", "candles_5m": len(candle_5m), "candles_1h": len(candle_1h)})
                         continue
 
-                    c5 = candle_5m.candles
-                    c1 = candle_1h.candles
-
-                    closes5 = [c["c"] for c in c5][-300:]
-                    highs5 = [c["h"] for c in c5][-300:]
-                    lows5 = [c["l"] for c in c5][-300:]
-                    closes1 = [c["c"] for c in c1][-200:]
+                    c5 = candle_5m.window(300)
+                    closes5 = c5.c
+                    highs5 = c5.h
+                    lows5 = c5.l
+                    c1 = candle_1h.window(200)
 
-                    efast5 = ema(closes5[-(EMA_FAST * 4):], EMA_FAST)
-                    eslow5 = ema(closes5[-(EMA_SLOW * 4):], EMA_SLOW)
-                    efast1 = ema(closes1[-(EMA_FAST * 4):], EMA_FAST)
-                    eslow1 = ema(closes1[-(EMA_SLOW * 4):], EMA_SLOW)
+                    # seeded once, then only bars closed since the last entry check are folded in
+                    efast5 = ema_fast5.advance(c5.t, closes5)
+                    eslow5 = ema_slow5.advance(c5.t, closes5)
+                    efast1 = ema_fast1.advance(c1.t, c1.c)
+                    eslow1 = ema_slow1.advance(c1.t, c1.c)
 
                     if None in (efast5, eslow5, efast1, eslow1):
                         log({"event": "waiting_indicators"})
@@ -306,20 +239,19 @@ async def main():
                     emaTrendLong = efast5 > eslow5
                     emaTrendShort = efast5 < eslow5
 
-                    idx_hi = last_confirmed_swing_high(highs5, PIVOT_L)
-                    idx_lo = last_confirmed_swing_low(lows5, PIVOT_L)
+                    # ATR + confirmed pivots on the same window, one fused pass
+                    a, idx_hi, idx_lo = bar_features(highs5, lows5, closes5, ATR_LEN, PIVOT_L)
                     if idx_hi is None or idx_lo is None:
                         log({"event": "waiting_swings"})
                         continue
 
-                    lastSwingHigh = highs5[idx_hi]
-                    lastSwingLow = lows5[idx_lo]
+                    lastSwingHigh = float(highs5[idx_hi])
+                    lastSwingLow = float(lows5[idx_lo])
 
-                    prev_close = c5[-2]["c"]
+                    prev_close = float(closes5[-2])
                     bosUp = (prev_close <= lastSwingHigh) and (closed["c"] > lastSwingHigh)
                     bosDown = (prev_close >= lastSwingLow) and (closed["c"] < lastSwingLow)
 
-                    a = atr_from_candles(c5, length=ATR_LEN)
                     if a is None:
                         log({"event": "waiting_atr"})
                         continue
@@ -450,4 +382,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    _uvloop.install()
     asyncio.run(main())
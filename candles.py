@@ -0,0 +1,230 @@
+import time
+from dataclasses import dataclass
+from operator import itemgetter
+
+import httpx
+import numpy as np
+
+from _fastjson import loads as json_loads
+
+
+NS = 1_000_000_000
+
+
+class CandleBuilder:
+    """
+    Tick -> OHLC bars.
+
+    Closed bars live column-wise in preallocated arrays (t/o/h/l/c, first `n`
+    slots valid), so windows are zero-copy views. The open bar is kept as plain
+    scalars (cur_t/cur_o/cur_h/cur_l/cur_c). When the arrays fill up, the newest
+    half is moved to the front so views stay contiguous.
+    """
+    def __init__(self, tf_seconds: int, cap: int = 1024):
+        self.tf = tf_seconds
+        self.tf_ns = tf_seconds * NS
+        self.cap = cap
+        self.t = np.empty(cap, dtype=np.int64)
+        self.o = np.empty(cap, dtype=np.float64)
+        self.h = np.empty(cap, dtype=np.float64)
+        self.l = np.empty(cap, dtype=np.float64)
+        self.c = np.empty(cap, dtype=np.float64)
+        self.n = 0
+        self.last_t = None  # t of the newest closed bar (python int)
+        self.cur_t = None   # bucket start of the open bar; None before the first tick
+        self.cur_o = self.cur_h = self.cur_l = self.cur_c = 0.0
+
+    def __len__(self):
+        return self.n
+
+    def bucket(self, ts_ns: int) -> int:
+        """Start (seconds) of the bar `ts_ns` falls in; integer-only."""
+        return (ts_ns // self.tf_ns) * self.tf
+
+    def _close_current(self):
+        if self.n == self.cap:
+            keep = self.cap // 2
+            for col in (self.t, self.o, self.h, self.l, self.c):
+                col[:keep] = col[self.n - keep:self.n]
+            self.n = keep
+        i = self.n
+        self.t[i] = self.cur_t
+        self.o[i] = self.cur_o
+        self.h[i] = self.cur_h
+        self.l[i] = self.cur_l
+        self.c[i] = self.cur_c
+        self.n = i + 1
+        self.last_t = self.cur_t
+
+    def update(self, ts_ns: int, price: float) -> bool:
+        """Fold one tick into the open bar; True when it closed the previous bar."""
+        b = self.bucket(ts_ns)
+        if b != self.cur_t:
+            closed = self.cur_t is not None
+            if closed:
+                self._close_current()
+            self.cur_t = b
+            self.cur_o = self.cur_h = self.cur_l = self.cur_c = price
+            return closed
+        if price > self.cur_h:
+            self.cur_h = price
+        if price < self.cur_l:
+            self.cur_l = price
+        self.cur_c = price
+        return False
+
+    def append_bar(self, t: int, o: float, h: float, l: float, c: float):
+        """Close the open bar (if any) and open one with the given OHLC (REST gap fill)."""
+        if self.cur_t is not None:
+            self._close_current()
+        self.cur_t, self.cur_o, self.cur_h, self.cur_l, self.cur_c = t, o, h, l, c
+
+    def last_closed(self):
+        if self.n == 0:
+            return None
+        i = self.n - 1
+        return {"t": int(self.t[i]), "o": float(self.o[i]), "h": float(self.h[i]), "l": float(self.l[i]), "c": float(self.c[i])}
+
+    def window(self, k: int) -> "HistArrays":
+        """Last k closed bars as views; only valid until the next update."""
+        s = max(0, self.n - k)
+        return HistArrays(self.t[s:self.n], self.o[s:self.n], self.h[s:self.n], self.l[s:self.n], self.c[s:self.n])
+
+    def seed(self, hist: "HistArrays"):
+        """
+        Load bootstrap history; the last bar stays open as the current candle.
+        """
+        if len(hist) == 0:
+            return
+        self.restore({
+            "t": hist.t[:-1], "o": hist.o[:-1], "h": hist.h[:-1], "l": hist.l[:-1], "c": hist.c[:-1],
+            "current": [int(hist.t[-1]), float(hist.o[-1]), float(hist.h[-1]), float(hist.l[-1]), float(hist.c[-1])],
+        })
+
+    def snapshot(self, keep: int, upto: int | None = None) -> dict:
+        """
+        Up to `keep` closed bars as column views (_fastjson.dumps handles the arrays).
+        With `upto`, only bars before that index are taken and the open bar is left out.
+        """
+        end = self.n if upto is None else upto
+        s = max(0, end - keep)
+        current = None
+        if upto is None and self.cur_t is not None:
+            current = [self.cur_t, self.cur_o, self.cur_h, self.cur_l, self.cur_c]
+        return {
+            "t": self.t[s:end], "o": self.o[s:end], "h": self.h[s:end], "l": self.l[s:end], "c": self.c[s:end],
+            "current": current,
+        }
+
+    def restore(self, snap: dict):
+        t = np.asarray(snap["t"], dtype=np.int64)
+        m = min(len(t), self.cap)
+        s = len(t) - m
+        self.t[:m] = t[s:]
+        for name in ("o", "h", "l", "c"):
+            getattr(self, name)[:m] = np.asarray(snap[name], dtype=np.float64)[s:]
+        self.n = m
+        self.last_t = int(self.t[m - 1]) if m else None
+
+        current = snap.get("current")
+        if current:
+            self.cur_t = int(current[0])
+            self.cur_o, self.cur_h, self.cur_l, self.cur_c = (float(x) for x in current[1:])
+        else:
+            self.cur_t = None
+
+
+def atr_from_candles(h, l, c, length=14):
+    """ATR (SMA of true range) over the last `length` bars of h/l/c columns."""
+    if len(c) < length + 1:
+        return None
+    # slice first: list inputs only convert the bars that are used
+    h = np.asarray(h[-length:], dtype=np.float64)
+    l = np.asarray(l[-length:], dtype=np.float64)
+    prev_c = np.asarray(c[-length - 1:-1], dtype=np.float64)
+    tr = np.maximum(np.maximum(h - l, np.abs(h - prev_c)), np.abs(l - prev_c))
+    return float(tr.mean())
+
+
+@dataclass
+class HistArrays:
+    """Bootstrap candles as column arrays (t in seconds, aligned to tf)."""
+    t: np.ndarray
+    o: np.ndarray
+    h: np.ndarray
+    l: np.ndarray
+    c: np.ndarray
+
+    def __len__(self):
+        return len(self.t)
+
+    def bar(self, i: int = -1) -> dict:
+        """One candle as a plain {t, o, h, l, c} dict of python scalars."""
+        return {"t": int(self.t[i]), "o": float(self.o[i]), "h": float(self.h[i]),
+                "l": float(self.l[i]), "c": float(self.c[i])}
+
+
+def aggregate_closes(t: np.ndarray, closes: np.ndarray, tf_sec: int) -> HistArrays:
+    """
+    Group close prices into tf_sec buckets (same OHLC CandleBuilder.update would build).
+    """
+    if len(t) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return HistArrays(np.empty(0, dtype=np.int64), empty, empty, empty, empty)
+    buckets = (t // tf_sec) * tf_sec
+    keys, starts = np.unique(buckets, return_index=True)
+    ends = np.append(starts[1:], len(closes)) - 1
+    return HistArrays(
+        t=keys,
+        o=closes[starts],
+        h=np.maximum.reduceat(closes, starts),
+        l=np.minimum.reduceat(closes, starts),
+        c=closes[ends],
+    )
+
+
+async def bootstrap_candles(symbol: str, tf_sec: int, limit=300) -> HistArrays:
+    """
+    Bootstrap from hyperliquid REST-like endpoint (via Info API endpoint through httpx).
+    Returns column arrays; CandleBuilder.seed() consumes them.
+    """
+    # If you want volume/VWAP/POC later, this is where we'd extend.
+    url = "https://api.hyperliquid.xyz/info"
+    now = int(time.time() * 1000)
+    start = now - (limit * tf_sec * 1000)
+
+    payload = {
+        "type": "candleSnapshot",
+        "req": {
+            "coin": symbol,
+            "interval": f"{tf_sec // 60}m" if tf_sec < 3600 else "1h",
+            "startTime": start,
+            "endTime": now,
+        },
+    }
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        r = await client.post(url, json=payload)
+        r.raise_for_status()
+        raw = json_loads(r.content)
+
+    return hist_from_snapshot(raw, tf_sec)
+
+
+_OHLC = itemgetter("o", "h", "l", "c")
+
+
+def hist_from_snapshot(raw: list, tf_sec: int) -> HistArrays:
+    """
+    candleSnapshot rows -> HistArrays (t in seconds, aligned to tf_sec).
+
+    One pass pulls the o/h/l/c strings of every row into a single (n, 4) float64
+    conversion; the transpose copy leaves each column contiguous.
+    """
+    n = len(raw)
+    t = np.fromiter((row["t"] for row in raw), dtype=np.int64, count=n) // 1000
+    if n:
+        o, h, l, c = np.array([_OHLC(row) for row in raw], dtype=np.float64).T.copy()
+    else:
+        o = h = l = c = np.empty(0, dtype=np.float64)
+    return HistArrays(t=t - (t % tf_sec), o=o, h=h, l=l, c=c)
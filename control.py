@@ -83,9 +83,11 @@ async def systemctl(action: str, symbol: str) -> Tuple[bool, str]:
 
     if action == "status":
         # status can be noisy; use is-active + show main pid as clean status
-        code_a, out_a, err_a = await run_cmd("systemctl", "is-active", service)
+        (code_a, out_a, err_a), (code_p, out_p, err_p) = await asyncio.gather(
+            run_cmd("systemctl", "is-active", service),
+            run_cmd("systemctl", "show", service, "-p", "MainPID"),
+        )
         state = (out_a.strip() or err_a.strip() or "unknown")
-        code_p, out_p, err_p = await run_cmd("systemctl", "show", service, "-p", "MainPID")
         pid_line = (out_p.strip() or err_p.strip() or "")
         return True, f"{service}: {state}\n{pid_line}"
 
@@ -1,16 +1,226 @@
 import numpy as np
 
+from _njit import njit
+
+
+@njit(cache=True)
+def _ema_seed(values, period):
+    k = 2.0 / (period + 1)
+    e = values[0]
+    for i in range(1, len(values)):
+        e = values[i] * k + e * (1.0 - k)
+    return e
+
+
+# above this many values ema() uses the closed form below instead of the recurrence
+EMA_CLOSED_FORM_MIN = 256
+
+
+def _ema_closed_form(values, period):
+    # e_n = (1-k)^(n-1) * x_0 + sum_{i>=1} k * (1-k)^(n-1-i) * x_i, as one dot product
+    k = 2.0 / (period + 1)
+    decay = (1.0 - k) ** np.arange(len(values) - 1, -1, -1, dtype=np.float64)
+    w = k * decay
+    w[0] = decay[0]
+    return np.dot(w, values)
+
+
 def ema(values, period: int):
     """
     Compute EMA for a list/array of values.
     Returns the latest EMA value (float) or None if not enough data.
     """
-    values = np.array(values, dtype=float)
+    values = np.asarray(values, dtype=np.float64)
     if len(values) < period:
         return None
+    if len(values) > EMA_CLOSED_FORM_MIN:
+        return float(_ema_closed_form(values, period))
+    return float(_ema_seed(values, period))
+
+
+@njit(cache=True)
+def _ema_multi(values, periods):
+    ks = 2.0 / (periods + 1.0)
+    es = np.full(len(periods), values[0])
+    for i in range(1, len(values)):
+        x = values[i]
+        for j in range(len(periods)):
+            es[j] = x * ks[j] + es[j] * (1.0 - ks[j])
+    return es
+
+
+def emas(values, periods):
+    """
+    Latest EMA for each of `periods` over the same values, in one pass.
+    Matches ema() per period (None where there are fewer values than the period).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return tuple(None for _ in periods)
+    es = _ema_multi(values, np.asarray(periods, dtype=np.float64))
+    return tuple(None if len(values) < p else float(e) for p, e in zip(periods, es))
+
+
+class EmaTracker:
+    """
+    Incremental EMA over closed bars.
+
+    Seeds once from the last `seed_bars` closes (default period*4, the window the
+    bar loops' ema() calls use; 0 = every close given), then folds in only bars
+    newer than the last one seen: O(1) per bar.
+    """
+    def __init__(self, period: int, seed_bars: int | None = None):
+        self.period = period
+        self.seed_bars = period * 4 if seed_bars is None else seed_bars
+        self.k = 2.0 / (period + 1)
+        self.value = None
+        self.last_t = None
+
+    def advance(self, t, closes):
+        """Bring the EMA up to the newest bar of the (t, closes) columns; returns the value."""
+        if len(t) == 0:
+            return self.value
+        newest = int(t[-1])
+        if newest == self.last_t:
+            # no bar closed on this timeframe since the last call (e.g. 1h between boundaries)
+            return self.value
+        if self.last_t is None:
+            self.value = ema(closes[-self.seed_bars:], self.period)
+            if self.value is None:
+                return None
+        else:
+            start = int(np.searchsorted(t, self.last_t, side="right"))
+            k = self.k
+            e = self.value
+            for x in closes[start:].tolist():
+                e = x * k + e * (1.0 - k)
+            self.value = e
+        self.last_t = newest
+        return self.value
+
+
+@njit(cache=True)
+def _true_range(h, l, pc):
+    tr = h - l
+    if abs(h - pc) > tr:
+        tr = abs(h - pc)
+    if abs(l - pc) > tr:
+        tr = abs(l - pc)
+    return tr
+
+
+@njit(cache=True)
+def _swings(h, l, pivot_l):
+    # one backward pass finds both the newest confirmed swing high and low
+    n = len(h)
+    idx_hi = -1
+    idx_lo = -1
+    for i in range(n - pivot_l - 1, pivot_l - 1, -1):
+        if idx_hi >= 0 and idx_lo >= 0:
+            break
+        is_hi = idx_hi < 0
+        is_lo = idx_lo < 0
+        for j in range(i - pivot_l, i + pivot_l + 1):
+            if j == i:
+                continue
+            if is_hi and not h[i] > h[j]:
+                is_hi = False
+            if is_lo and not l[i] < l[j]:
+                is_lo = False
+            if not is_hi and not is_lo:
+                break
+        if is_hi:
+            idx_hi = i
+        if is_lo:
+            idx_lo = i
+    return idx_hi, idx_lo
+
+
+@njit(cache=True)
+def _bar_features(h, l, c, atr_len, pivot_l):
+    n = len(c)
+    atr = np.nan
+    if n >= atr_len + 1:
+        s = 0.0
+        for i in range(n - atr_len, n):
+            s += _true_range(h[i], l[i], c[i - 1])
+        atr = s / atr_len
+    idx_hi, idx_lo = _swings(h, l, pivot_l)
+    return atr, idx_hi, idx_lo
+
+
+def bar_features(h, l, c, atr_len: int, pivot_l: int):
+    """
+    ATR plus the last confirmed swing high/low indices in one pass over the window.
+    Returns (atr, idx_hi, idx_lo); each is None when there isn't enough data,
+    matching atr_from_candles / last_confirmed_swing_high / last_confirmed_swing_low.
+    """
+    atr, idx_hi, idx_lo = _bar_features(
+        np.asarray(h, dtype=np.float64),
+        np.asarray(l, dtype=np.float64),
+        np.asarray(c, dtype=np.float64),
+        atr_len,
+        pivot_l,
+    )
+    return (
+        None if np.isnan(atr) else float(atr),
+        int(idx_hi) if idx_hi >= 0 else None,
+        int(idx_lo) if idx_lo >= 0 else None,
+    )
+
+
+def last_swings(h, l, pivot_l: int):
+    """ (idx_hi, idx_lo) of the last confirmed swing high/low, None where there is none. """
+    idx_hi, idx_lo = _swings(np.asarray(h, dtype=np.float64), np.asarray(l, dtype=np.float64), pivot_l)
+    return (
+        int(idx_hi) if idx_hi >= 0 else None,
+        int(idx_lo) if idx_lo >= 0 else None,
+    )
+
+
+@njit(cache=True)
+def _wilder_fold(h, l, c, start, atr, length):
+    for i in range(start, len(c)):
+        atr += (_true_range(h[i], l[i], c[i - 1]) - atr) / length
+    return atr
+
+
+class AtrTracker:
+    """
+    Wilder ATR over closed bars: atr += (tr - atr) / length.
+
+    Seeds from the mean of the first `length` true ranges in the window and
+    smooths through the rest of it, then folds in only bars newer than the last
+    one seen: O(1) per bar.
+    """
+    def __init__(self, length: int = 14):
+        self.length = length
+        self.value = None
+        self.last_t = None
 
-    k = 2 / (period + 1)
-    e = float(values[0])
-    for v in values[1:]:
-        e = float(v) * k + e * (1 - k)
-    return float(e)
+    def advance(self, t, h, l, c):
+        """Bring the ATR up to the newest bar of the (t, h, l, c) columns; returns the value."""
+        if len(t) == 0:
+            return self.value
+        newest = int(t[-1])
+        if newest == self.last_t:
+            return self.value
+        h = np.asarray(h, dtype=np.float64)
+        l = np.asarray(l, dtype=np.float64)
+        c = np.asarray(c, dtype=np.float64)
+        n = self.length
+        if self.last_t is None:
+            if len(c) < n + 1:
+                return None
+            seed = float(np.mean(np.maximum(np.maximum(
+                h[1:n + 1] - l[1:n + 1],
+                np.abs(h[1:n + 1] - c[:n])),
+                np.abs(l[1:n + 1] - c[:n]),
+            )))
+            self.value = float(_wilder_fold(h, l, c, n + 1, seed, n))
+        else:
+            # bar 0 has no previous close in the window; only a gap longer than it lands there
+            start = max(1, int(np.searchsorted(t, self.last_t, side="right")))
+            self.value = float(_wilder_fold(h, l, c, start, self.value, n))
+        self.last_t = newest
+        return self.value
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import atexit
 import csv
 import os
+import time
 from dataclasses import asdict, is_dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, NamedTuple, Union
 
 
 def utc_now_iso() -> str:
@@ -15,15 +17,91 @@ def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
-def _write_row(path: str, fieldnames: list[str], row: Dict[str, Any]) -> None:
-    _ensure_dir(os.path.dirname(path) or ".")
-    file_exists = os.path.exists(path)
-    with open(path, "a", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+# path -> open append handle. Rows are written from one writer at a time (the bot's
+# side-effect worker), so the handles stay open instead of an open/close per row.
+_handles: Dict[str, Any] = {}
+
+# Snapshot/decision rows collect in each handle's buffer and reach the file in one
+# write() per JOURNAL_FLUSH_S (or when JOURNAL_BUFFER fills up). Trades are flushed
+# and fsynced on every row.
+JOURNAL_BUFFER = 128 * 1024
+JOURNAL_FLUSH_S = 5.0
+
+_last_flush = 0.0
+
+# Synced files (trades) open with O_DSYNC where the OS has it: each flush() is then a
+# single durable write() with no separate fsync round trip.
+_O_DSYNC = getattr(os, "O_DSYNC", 0)
+
+
+def _dsync_opener(path: str, flags: int) -> int:
+    return os.open(path, flags | _O_DSYNC, 0o644)
+
+
+def _append_handle(path: str, fieldnames: list[str], sync: bool = False):
+    f = _handles.get(path)
+    if f is None:
+        _ensure_dir(os.path.dirname(path) or ".")
+        file_exists = os.path.exists(path)
+        f = open(path, "a", newline="", buffering=JOURNAL_BUFFER, opener=_dsync_opener if sync else None)
         if not file_exists:
-            w.writeheader()
-        safe = {k: row.get(k, "") for k in fieldnames}
-        w.writerow(safe)
+            csv.writer(f).writerow(fieldnames)
+        _handles[path] = f
+    return f
+
+
+def flush_all() -> None:
+    """Push every buffered journal row to disk."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    for f in _handles.values():
+        f.flush()
+
+
+atexit.register(flush_all)
+
+
+def _after_write(f, sync: bool) -> None:
+    if sync:
+        f.flush()
+        if not _O_DSYNC:
+            os.fsync(f.fileno())
+    elif time.monotonic() - _last_flush >= JOURNAL_FLUSH_S:
+        flush_all()
+
+
+def _write_row(path: str, fieldnames: list[str], row: Dict[str, Any], sync: bool = False) -> None:
+    f = _append_handle(path, fieldnames, sync)
+    w = csv.DictWriter(f, fieldnames=fieldnames)
+    safe = {k: row.get(k, "") for k in fieldnames}
+    w.writerow(safe)
+    _after_write(f, sync)
+
+
+def _write_values(path: str, fieldnames: list[str], values: tuple) -> None:
+    # same file layout as _write_row, for rows that already are in column order
+    f = _append_handle(path, fieldnames)
+    csv.writer(f).writerow(values)
+    _after_write(f, False)
+
+
+class SnapshotRow(NamedTuple):
+    """
+    One snapshots.csv row without ts_utc/session_id (Journal adds those).
+    Fields are in column order, so writing it needs no dict or key lookups.
+    """
+    symbol: str
+    tf: str
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: Any = ""
+    ema9: Any = ""
+    ema21: Any = ""
+    vwap: Any = ""
+    poc: Any = ""
+    rsi: Any = ""
 
 
 def _stringify_list(v: Any) -> Any:
@@ -36,12 +114,58 @@ def flatten_for_csv(d: Dict[str, Any]) -> Dict[str, Any]:
     return {k: _stringify_list(v) for k, v in d.items()}
 
 
+_DECISION_FIELDS = [
+    "ts_utc",
+    "symbol",
+    "mode",
+    "strategy",
+    "data_fresh_ms",
+    "px_last",
+    "spread_bps",
+    "vwap_5m",
+    "poc_5m",
+    "vwap_1h",
+    "poc_1h",
+    "ema9_1h",
+    "ema21_1h",
+    "bias_1h",
+    "bias_reason",
+    "rsi_1h",
+    "bos_dir",
+    "bos_level",
+    "retest_level",
+    "retest_state",
+    "acceptance_bars",
+    "acceptance_required",
+    "acceptance_state",
+    "vol_5m",
+    "vol_ma_20",
+    "vol_state",
+    "vol_reason",
+    "entry_plan",
+    "entry_px",
+    "invalidation_px",
+    "stop_px",
+    "tp1_px",
+    "runner_trail",
+    "rr_to_tp1",
+    "gates_required",
+    "gates_passed",
+    "gates_failed",
+    "action",
+    "confidence",
+    "notes",
+    "session_id",
+]
+_DECISION_FIELD_SET = frozenset(_DECISION_FIELDS)
+
+
 class Journal:
     def __init__(self, base_dir: str = "data", session_id: str = "default"):
         self.base_dir = base_dir
         self.session_id = session_id
 
-    def write_snapshot(self, snap: Dict[str, Any]) -> None:
+    def write_snapshot(self, snap: Union[SnapshotRow, Dict[str, Any]]) -> None:
         path = os.path.join(self.base_dir, "snapshots.csv")
         fieldnames = [
             "ts_utc",
@@ -59,6 +183,9 @@ class Journal:
             "rsi",
             "session_id",
         ]
+        if isinstance(snap, SnapshotRow):
+            _write_values(path, fieldnames, (utc_now_iso(), *snap, self.session_id))
+            return
         row = dict(snap)
         row.setdefault("ts_utc", utc_now_iso())
         row.setdefault("session_id", self.session_id)
@@ -66,61 +193,24 @@ class Journal:
 
     def write_decision(self, report: Any) -> None:
         path = os.path.join(self.base_dir, "decisions.csv")
-        if is_dataclass(report):
-            d = asdict(report)
-        else:
-            d = dict(report)
-
-        d = flatten_for_csv(d)
-        d.setdefault("ts_utc", utc_now_iso())
-        d.setdefault("session_id", self.session_id)
-
-        base_order = [
-            "ts_utc",
-            "symbol",
-            "mode",
-            "strategy",
-            "data_fresh_ms",
-            "px_last",
-            "spread_bps",
-            "vwap_5m",
-            "poc_5m",
-            "vwap_1h",
-            "poc_1h",
-            "ema9_1h",
-            "ema21_1h",
-            "bias_1h",
-            "bias_reason",
-            "rsi_1h",
-            "bos_dir",
-            "bos_level",
-            "retest_level",
-            "retest_state",
-            "acceptance_bars",
-            "acceptance_required",
-            "acceptance_state",
-            "vol_5m",
-            "vol_ma_20",
-            "vol_state",
-            "vol_reason",
-            "entry_plan",
-            "entry_px",
-            "invalidation_px",
-            "stop_px",
-            "tp1_px",
-            "runner_trail",
-            "rr_to_tp1",
-            "gates_required",
-            "gates_passed",
-            "gates_failed",
-            "action",
-            "confidence",
-            "notes",
-            "session_id",
-        ]
-        extras = [k for k in d.keys() if k not in base_order]
-        fieldnames = base_order + sorted(extras)
-        _write_row(path, fieldnames, d)
+        d = asdict(report) if is_dataclass(report) else report
+
+        extras = d.keys() - _DECISION_FIELD_SET
+        if extras:
+            d = flatten_for_csv(d)
+            d.setdefault("ts_utc", utc_now_iso())
+            d.setdefault("session_id", self.session_id)
+            _write_row(path, _DECISION_FIELDS + sorted(extras), d)
+            return
+
+        # known columns only: one tuple in column order, no dict copies
+        get = d.get
+        values = [_stringify_list(get(k, "")) for k in _DECISION_FIELDS]
+        if "ts_utc" not in d:
+            values[0] = utc_now_iso()
+        if "session_id" not in d:
+            values[-1] = self.session_id
+        _write_values(path, _DECISION_FIELDS, values)
 
     def write_trade(self, trade: Dict[str, Any]) -> None:
         path = os.path.join(self.base_dir, "trades.csv")
@@ -144,4 +234,4 @@ class Journal:
         row = dict(trade)
         row.setdefault("ts_utc", utc_now_iso())
         row.setdefault("session_id", self.session_id)
-        _write_row(path, fieldnames, row)
+        _write_row(path, fieldnames, row, sync=True)
@@ -1,7 +1,8 @@
 # logger.py
-import json
 from datetime import datetime
 
+from _fastjson import dumps as json_dumps
+
 LOG_LEVEL = "TRADE"  
 # options: "DEBUG", "TRADE"
 
@@ -24,5 +25,5 @@ def log(payload: dict):
         return  # silently ignore
 
     payload["ts"] = datetime.utcnow().isoformat()
-    print(json.dumps(payload))
+    print(json_dumps(payload).decode())
 
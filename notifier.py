@@ -1,17 +1,62 @@
+import asyncio
+
 import httpx
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+from logger import log
+
+# False when Telegram isn't configured: callers can skip building messages entirely
+NOTIFY_ENABLED = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+
+_SEND_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+
+
+# One pooled client for every send: keep-alive saves a TCP+TLS handshake per message.
+_client: httpx.AsyncClient | None = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(10, connect=5.0))
+    return _client
+
+
+async def aclose_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 async def notify(message: str):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+    if not NOTIFY_ENABLED:
         return
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": TELEGRAM_CHAT_ID,
         "text": message,
         "disable_web_page_preview": True,
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(url, json=payload)
-        r.raise_for_status()
+    r = await _get_client().post(_SEND_URL, json=payload)
+    r.raise_for_status()
+
+
+# fire-and-forget sends; the loop only keeps weak refs to tasks, so hold them here
+_pending: set = set()
+
+
+async def _notify_logged(message: str):
+    try:
+        await notify(message)
+    except Exception as e:
+        log({"event": "notify_failed", "error": str(e), "msg": message[:200]})
+
+
+def notify_bg(message: str):
+    """ Send a Telegram message without waiting on it; failures are logged, not raised. """
+    if not NOTIFY_ENABLED:
+        return
+    task = asyncio.create_task(_notify_logged(message))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
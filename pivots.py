@@ -1,24 +1,51 @@
 from typing import Optional, List
 
+import numpy as np
+
+from _njit import njit
+
+
+@njit(cache=True)
+def _swing_low_idx(lows, L):
+    # scan from the newest confirmable bar back; -1 keeps the return type jit-stable
+    n = len(lows)
+    for i in range(n - L - 1, L - 1, -1):
+        pivot = lows[i]
+        ok = True
+        for j in range(i - L, i + L + 1):
+            if j != i and not pivot < lows[j]:
+                ok = False
+                break
+        if ok:
+            return i
+    return -1
+
+
+@njit(cache=True)
+def _swing_high_idx(highs, L):
+    n = len(highs)
+    for i in range(n - L - 1, L - 1, -1):
+        pivot = highs[i]
+        ok = True
+        for j in range(i - L, i + L + 1):
+            if j != i and not pivot > highs[j]:
+                ok = False
+                break
+        if ok:
+            return i
+    return -1
+
+
 def last_confirmed_swing_low(lows: List[float], L: int) -> Optional[int]:
     """
     Return index of last confirmed swing low using pivot L.
     Confirmed pivot at i means lows[i] is lower than L bars on the left
     AND lower than L bars on the right.
     """
-    n = len(lows)
-    if n < 2 * L + 1:
+    if len(lows) < 2 * L + 1:
         return None
-
-    last_idx = None
-    for i in range(L, n - L):
-        pivot = lows[i]
-        left = lows[i - L:i]
-        right = lows[i + 1:i + L + 1]
-        if all(pivot < x for x in left) and all(pivot < x for x in right):
-            last_idx = i
-
-    return last_idx
+    i = _swing_low_idx(np.asarray(lows, dtype=np.float64), L)
+    return int(i) if i >= 0 else None
 
 
 def last_confirmed_swing_high(highs: List[float], L: int) -> Optional[int]:
@@ -26,15 +53,7 @@ def last_confirmed_swing_high(highs: List[float], L: int) -> Optional[int]:
     Returns index of last confirmed swing high.
     A swing high is higher than L bars on both sides.
     """
-    n = len(highs)
-    if n < 2 * L + 1:
+    if len(highs) < 2 * L + 1:
         return None
-
-    for i in range(n - L - 1, L - 1, -1):
-        pivot = highs[i]
-        left = highs[i - L:i]
-        right = highs[i + 1:i + 1 + L]
-        if all(pivot > x for x in left) and all(pivot > x for x in right):
-            return i
-
-    return None
+    i = _swing_high_idx(np.asarray(highs, dtype=np.float64), L)
+    return int(i) if i >= 0 else None
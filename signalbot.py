@@ -1,15 +1,21 @@
 import asyncio
 import json
+import math
 import time
 import random
 import httpx
 import websockets
-import subprocess
 import os
 import uuid
 
 from grid_engine import GridBot, GridParams
 from telegram_control import telegram_poll_commands
+from ws_feed import FrameBatch, all_mids_price, mid_needle
+from _fastjson import loads as json_loads, dumps as json_dumps
+from _njit import njit
+import _shutdown
+import _uvloop
+from candles import NS, CandleBuilder, atr_from_candles, aggregate_closes, bootstrap_candles
 
 from config import (
     SYMBOL, TF_SECONDS,
@@ -20,12 +26,12 @@ from config import (
     STRATEGY,
 )
 
-from indicators import ema
+from indicators import ema, EmaTracker, AtrTracker, last_swings
 from pivots import last_confirmed_swing_low, last_confirmed_swing_high
 from logger import log
-from notifier import notify
-from journal import Journal
-from trade_events import append_event, new_trade_id
+from notifier import notify, notify_bg, NOTIFY_ENABLED, aclose_client as aclose_notify_client
+from journal import Journal, SnapshotRow, flush_all as flush_journal
+from trade_events import append_events, new_trade_id
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
@@ -80,16 +86,38 @@ from config import ALL_SYMBOLS, SYMBOL_JITTER
 def _svc_name(sym: str) -> str:
     return f"signalbot@{sym}.service"
 
-def _run_systemctl(action: str, symbols: list[str]):
-    services = [_svc_name(s) for s in symbols]
-    p = subprocess.run(
-        ["sudo", "systemctl", action, *services],
-        capture_output=True, text=True,
+# unit names are fixed for the process: build them once (also the O(1) symbol check)
+_SVC_NAMES = {s: _svc_name(s) for s in ALL_SYMBOLS}
+_ALL_SVCS = tuple(_SVC_NAMES.values())
+
+async def _run_cmd(*args: str, timeout: int = 30) -> tuple[int, str, str]:
+    """
+    Run a command without blocking the event loop (WS recv keeps draining).
+    A hung command (e.g. sudo waiting on a password) is killed after `timeout`s.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
     )
-    out = (p.stdout or "") + (p.stderr or "")
-    return p.returncode, out.strip()
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return 124, "", "timeout"
+    return proc.returncode, (out or b"").decode(errors="ignore"), (err or b"").decode(errors="ignore")
+
+async def _run_systemctl(action: str, symbols: list[str]):
+    services = [_SVC_NAMES[s] for s in symbols]
+    rc, out, err = await _run_cmd("sudo", "systemctl", action, *services)
+    _status_cache["ts"] = float("-inf")  # unit states changed: next /status re-checks
+    return rc, (out + err).strip()
 
 ONE_HOUR = 3600
+WS_BACKOFF_BASE = 0.5      # first reconnect delay (s), doubled per consecutive failure
+WS_BACKOFF_MAX = 30.0
+GRID_ENABLED = os.getenv("GRID_ENABLED", "0") == "1"
 grid = None  # ensure global exists
 
 
@@ -97,118 +125,149 @@ grid = None  # ensure global exists
 # TELEGRAM COMMAND HANDLER
 # ============================
 
-TELEGRAM_OFFSET_FILE = os.getenv("TELEGRAM_OFFSET_FILE", "telegram_offset.json")
+# built once at import; the ticker list follows ALL_SYMBOLS
+_HELP_TEXT = (
+    "✅ SignalBot control is live.\n\n"
+    "Service Control:\n"
+    "/status\n"
+    "/start_all\n"
+    "/stop_all\n"
+    "/restart_all\n\n"
+    "Single Ticker:\n"
+    f"/start {'|'.join(ALL_SYMBOLS)}\n"
+    f"/stop {'|'.join(ALL_SYMBOLS)}\n"
+    f"/restart {'|'.join(ALL_SYMBOLS)}\n\n"
+    "Grid Commands:\n"
+    "/grid_start SYMBOL lower upper grids usd_per_order\n"
+    "/grid_stop SYMBOL\n"
+    "/grid_status SYMBOL\n"
+    "/grid_rebuild SYMBOL\n"
+)
 
-def load_tg_offset() -> int:
-    try:
-        with open(TELEGRAM_OFFSET_FILE, "r") as f:
-            return int(json.load(f).get("last_update_id", 0))
-    except Exception:
-        return 0
 
-def save_tg_offset(last_update_id: int):
-    try:
-        tmp = TELEGRAM_OFFSET_FILE + ".tmp"
-        with open(tmp, "w") as f:
-            json.dump({"last_update_id": int(last_update_id)}, f)
-        os.replace(tmp, TELEGRAM_OFFSET_FILE)
-    except Exception:
-        pass
+async def _cmd_help(parts: list[str], sym: str | None):
+    await notify(_HELP_TEXT)
 
-async def handle_command(text: str):
-    global grid
-    t = (text or "").strip()
-    if not t:
-        return
-    parts = t.split()
-    cmd = parts[0].lower().split("@")[0]
-
-    # ---- HELP ----
-    if cmd in ("/start", "/help"):
-        await notify(
-            "✅ SignalBot control is live.\n\n"
-            "Service Control:\n"
-            "/status\n"
-            "/start_all\n"
-            "/stop_all\n"
-            "/restart_all\n\n"
-            "Single Ticker:\n"
-            "/start BTC|ETH|SOL|JUP|HYPE\n"
-            "/stop BTC|ETH|SOL|JUP|HYPE\n"
-            "/restart BTC|ETH|SOL|JUP|HYPE\n\n"
-            "Grid Commands:\n"
-            "/grid_start SYMBOL lower upper grids usd_per_order\n"
-            "/grid_stop SYMBOL\n"
-            "/grid_status SYMBOL\n"
-            "/grid_rebuild SYMBOL\n"
-        )
-        return
 
-    # ---- SERVICE STATUS ----
-    if cmd == "/status":
-        lines = []
-        for s in ALL_SYMBOLS:
-            p = subprocess.run(["systemctl", "is-active", _svc_name(s)], capture_output=True, text=True)
-            lines.append(f"{s}: {p.stdout.strip()}")
-        await notify("\n".join(lines))
-        return
+# ---- SERVICE STATUS ----
+STATUS_TTL_S = 1.5  # bursts of /status reuse the last answer instead of forking again
+_status_cache = {"ts": float("-inf"), "text": ""}
 
-    # ---- ALL SERVICE ACTIONS ----
-    if cmd in ("/start_all", "/stop_all", "/restart_all"):
-        action = cmd.replace("_all", "").replace("/", "")
-        rc, out = _run_systemctl(action, ALL_SYMBOLS)
+
+async def _cmd_status(parts: list[str], sym: str | None):
+    if time.monotonic() - _status_cache["ts"] < STATUS_TTL_S:
+        await notify(_status_cache["text"])
+        return
+    # systemctl accepts multiple units and prints one state per line, in order
+    _, out, _ = await _run_cmd("systemctl", "is-active", *_ALL_SVCS)
+    states = out.splitlines()
+    lines = []
+    for i, s in enumerate(ALL_SYMBOLS):
+        lines.append(f"{s}: {states[i].strip() if i < len(states) else 'unknown'}")
+    text = "\n".join(lines)
+    _status_cache["ts"] = time.monotonic()
+    _status_cache["text"] = text
+    await notify(text)
+
+
+# ---- ALL SERVICE ACTIONS ----
+def _cmd_all(action: str):
+    async def run(parts: list[str], sym: str | None):
+        rc, out = await _run_systemctl(action, ALL_SYMBOLS)
         if rc == 0:
             await notify(f"✅ {action.upper()} ALL OK")
         else:
             await notify(f"⚠️ {action.upper()} ALL failed:\n{out[:1500]}")
-        return
+    return run
 
-    # ---- SINGLE SERVICE ACTION ----
-    if cmd in ("/start", "/stop", "/restart"):
-        if len(parts) < 2:
+
+# ---- SINGLE SERVICE ACTION ----
+def _cmd_single(action: str):
+    async def run(parts: list[str], sym: str | None):
+        if sym is None:
             await notify("Usage: /start BTC (or /start_all)")
             return
-        sym = parts[1].upper()
-        if sym not in ALL_SYMBOLS:
+        if sym not in _SVC_NAMES:
             await notify(f"Unknown symbol: {sym}")
             return
-        action = cmd.replace("/", "")
-        rc, out = _run_systemctl(action, [sym])
+        rc, out = await _run_systemctl(action, [sym])
         if rc == 0:
             await notify(f"✅ {action.upper()} {sym} OK")
         else:
             await notify(f"⚠️ {action.upper()} {sym} failed:\n{out[:1500]}")
-        return
+    return run
 
-    # ---- GRID COMMANDS (UNCHANGED LOGIC) ----
-    if grid is None:
-        return
 
-    if len(parts) < 2:
-        return
+_cmd_start_one = _cmd_single("start")
 
-    target_symbol = parts[1].upper()
-    if target_symbol != SYMBOL:
-        return
 
-    if cmd == "/grid_start":
-        if len(parts) < 6:
-            await notify("Usage: /grid_start SYMBOL lower upper grids usd_per_order")
+async def _cmd_start(parts: list[str], sym: str | None):
+    # bare /start is Telegram's "open chat" command: answer with the help text
+    if sym is None:
+        await _cmd_help(parts, sym)
+    else:
+        await _cmd_start_one(parts, sym)
+
+
+# ---- GRID COMMANDS (UNCHANGED LOGIC) ----
+def _grid_cmd(fn):
+    """ Only act when this instance runs a grid and the command names its symbol. """
+    async def run(parts: list[str], sym: str | None):
+        if grid is None or sym != SYMBOL:
             return
-        lower = float(parts[2])
-        upper = float(parts[3])
-        grids = int(parts[4])
-        usd = float(parts[5])
-        await grid.start(GridParams(lower, upper, grids, usd))
+        await fn(parts, sym)
+    return run
+
+
+async def _grid_start(parts: list[str], sym: str | None):
+    if len(parts) < 6:
+        await notify("Usage: /grid_start SYMBOL lower upper grids usd_per_order")
+        return
+    lower = float(parts[2])
+    upper = float(parts[3])
+    grids = int(parts[4])
+    usd = float(parts[5])
+    await grid.start(GridParams(lower, upper, grids, usd))
+
 
-    elif cmd == "/grid_stop":
-        await grid.stop()
+async def _grid_stop(parts: list[str], sym: str | None):
+    await grid.stop()
 
-    elif cmd == "/grid_status":
-        await notify(await grid.status())
 
-    elif cmd == "/grid_rebuild":
-        await grid.rebuild()
+async def _grid_status(parts: list[str], sym: str | None):
+    await notify(await grid.status())
+
+
+async def _grid_rebuild(parts: list[str], sym: str | None):
+    await grid.rebuild()
+
+
+# command -> handler(parts, sym); built once, one dict lookup per Telegram update
+DISPATCH = {
+    "/help": _cmd_help,
+    "/status": _cmd_status,
+    "/start_all": _cmd_all("start"),
+    "/stop_all": _cmd_all("stop"),
+    "/restart_all": _cmd_all("restart"),
+    "/start": _cmd_start,
+    "/stop": _cmd_single("stop"),
+    "/restart": _cmd_single("restart"),
+    "/grid_start": _grid_cmd(_grid_start),
+    "/grid_stop": _grid_cmd(_grid_stop),
+    "/grid_status": _grid_cmd(_grid_status),
+    "/grid_rebuild": _grid_cmd(_grid_rebuild),
+}
+
+
+async def handle_command(text: str):
+    t = (text or "").strip()
+    if not t:
+        return
+    parts = t.split()
+    handler = DISPATCH.get(parts[0].lower().split("@")[0])
+    if handler is not None:
+        # every symbol-taking command reads the same argument: upper-case it once
+        await handler(parts, parts[1].upper() if len(parts) > 1 else None)
 
 
 # ============================
@@ -227,64 +286,306 @@ STRUCT_PAD_ATR = 0.10      # structure pad = ATR * 0.10
 ATR_SEATBELT_MULT = 1.2    # ATR seatbelt trail distance = ATR * 1.2
 RUNNER_TIME_STOP_BARS = 12 # after TP1, exit runner after 12 bars (~60 mins)
 RUNNER_ATR_MULT_1H = float(os.getenv("RUNNER_ATR_MULT_1H", "1.5"))  # V2 seatbelt on 1H ATR
+ATR_REFRESH_REL = 1e-4     # re-derive ATR buffers when ATR moves more than this (relative)
+DECISION_SAMPLE_BARS = 12  # idle/unchanged bars: journal one decision row per hour
 
+# Per-symbol guardrails, resolved once (kept in place; the stop no longer uses them)
+_PROFILE = SYMBOL_PROFILES.get(SYMBOL, DEFAULT_PROFILE)
 
-class CandleBuilder:
-    def __init__(self, tf_seconds: int):
-        self.tf = tf_seconds
-        self.current = None
-        self.candles = []
 
-    def _bucket(self, ts: float) -> int:
-        return int(ts // self.tf) * self.tf
+RUNNER_HOLD = 0
+RUNNER_EXIT_STOP = 1
+RUNNER_EXIT_EMA_CROSS = 2
+RUNNER_EXIT_TIME = 3
 
-    def update(self, ts: float, price: float):
-        b = self._bucket(ts)
-        if self.current is None or self.current["t"] != b:
-            if self.current is not None:
-                self.candles.append(self.current)
-            self.current = {"t": b, "o": price, "h": price, "l": price, "c": price}
-        else:
-            self.current["h"] = max(self.current["h"], price)
-            self.current["l"] = min(self.current["l"], price)
-            self.current["c"] = price
 
-    def last_closed(self):
-        return self.candles[-1] if self.candles else None
+@njit(cache=True)
+def _update_runner(side, h, l, entry, be_buf, struct_pad, seatbelt,
+                   struct_stop, atr_stop, hi_since, lo_since,
+                   pivot_px, pivot_t, tp1_t, closed_t, time_stop_s,
+                   prev_spread, spread):
+    """
+    One closed bar of RUNNER management. side is 1 (LONG) / -1 (SHORT), so every
+    "more protective" max/min is side * max(side * a, side * b). pivot_px is the
+    newest confirmed swing against the trade (low for LONG, high for SHORT).
+    spread is ema_fast - ema_slow; prev_spread is NaN when unknown (no cross then).
+    Returns (struct_stop, atr_stop, hi_since, lo_since, runner_stop, exit_code).
+    """
+    hi_since = max(hi_since, h)
+    lo_since = min(lo_since, l)
+    be_stop = entry + side * be_buf
+
+    # structure trailing only from swings formed after TP1
+    if pivot_t >= tp1_t:
+        struct_stop = side * max(side * struct_stop, side * (pivot_px - side * struct_pad))
+
+    # ATR seatbelt off the best extreme since TP1
+    extreme = hi_since if side == 1 else lo_since
+    atr_stop = side * max(side * atr_stop, side * (extreme - side * seatbelt))
+
+    runner_stop = side * max(side * be_stop, side * struct_stop, side * atr_stop)
+
+    adverse = l if side == 1 else h
+    if side * adverse <= side * runner_stop:
+        code = RUNNER_EXIT_STOP
+    # a cross needs the spread to be against the trade now, which a healthy
+    # runner almost never is, so the previous bar is only looked at then
+    elif side * spread < 0 and side * prev_spread >= 0:
+        code = RUNNER_EXIT_EMA_CROSS
+    elif closed_t - tp1_t >= time_stop_s:
+        code = RUNNER_EXIT_TIME
+    else:
+        code = RUNNER_HOLD
+    return struct_stop, atr_stop, hi_since, lo_since, runner_stop, code
 
 
-def atr_from_candles(candles, length=14):
-    if len(candles) < length + 1:
-        return None
-    trs = []
-    for i in range(-length, 0):
-        c = candles[i]
-        prev = candles[i - 1]
-        tr = max(
-            c["h"] - c["l"],
-            abs(c["h"] - prev["c"]),
-            abs(c["l"] - prev["c"]),
-        )
-        trs.append(tr)
-    return sum(trs) / len(trs)
+@njit(cache=True)
+def _step_structure(side, bos_level, retest_ref, acc, long_ok, short_ok, bos_up, bos_down,
+                    swing_hi, swing_lo, h, l, c, retest_buf):
+    """
+    One closed bar of the BOS -> retest -> acceptance machine. side is 0 (idle),
+    1 (LONG) or -1 (SHORT); bos_level/retest_ref are NaN when unset. long_ok /
+    short_ok are the bias + EMA trend gates for each side.
+    Returns (side, bos_level, retest_ref, acc, armed); armed is the side a BOS
+    armed on this bar (0 if none), so the caller can record the swing anchor.
+    """
+    armed = 0
+    # bias/trend flipped while waiting: drop the setup
+    if (side == 1 and not long_ok) or (side == -1 and not short_ok):
+        side = 0
+        bos_level = math.nan
+        retest_ref = math.nan
+        acc = 0
+
+    if bos_up and long_ok:
+        side = 1
+        armed = 1
+        bos_level = swing_hi
+        retest_ref = math.nan
+        acc = 0
+    elif bos_down and short_ok:
+        side = -1
+        armed = -1
+        bos_level = swing_lo
+        retest_ref = math.nan
+        acc = 0
+
+    if side != 0:
+        # retest: the bar reached back to the BOS level (within the buffer)
+        adverse = l if side == 1 else h
+        if side * adverse <= side * bos_level + retest_buf:
+            retest_ref = bos_level
+            acc = 0
+        # acceptance: consecutive closes beyond the retested level
+        if not math.isnan(retest_ref):
+            acc = acc + 1 if side * c > side * retest_ref else 0
+    return side, bos_level, retest_ref, acc, armed
+
+
+_SIDE_CODE = {None: 0, "LONG": 1, "SHORT": -1}
+_SIDE_NAME = {0: None, 1: "LONG", -1: "SHORT"}
+
+# Decision-report labels indexed by a + 2*b over two flags; the 4th slot keeps the
+# "first flag wins" precedence of the old if/else chains when both are set.
+_BIAS_LABEL = ("NEUTRAL", "LONG", "SHORT", "LONG")             # biasLong + 2*biasShort
+_BIAS_REASON = ("flat", "ema9>ema21", "ema9<ema21", "ema9>ema21")
+_BOS_LABEL = ("NONE", "UP", "DOWN", "UP")                      # bosUp + 2*bosDown
+_RETEST_LABEL = ("NONE", "ARMED", "TOUCHED", "TOUCHED")        # waitingRetest + 2*touched
+_ACCEPT_LABEL = ("NA", "FAIL", "PASS", "PASS")                 # touched + 2*accepted
+
+# Decision-report columns that never change for this bot; each row spreads these
+# and fills in only the per-bar fields.
+_REPORT_CONST = {
+    "symbol": SYMBOL,
+    "mode": "signal_only",
+    "strategy": "BOS_RETEST_ACCEPT_V1",
+    "spread_bps": "",
+    "vwap_5m": "",
+    "poc_5m": "",
+    "vwap_1h": "",
+    "poc_1h": "",
+    "rsi_1h": "",
+    "acceptance_required": ACCEPT_BARS,
+    "vol_5m": "",
+    "vol_ma_20": "",
+    "vol_state": "NA",
+    "vol_reason": "",
+    "runner_trail": "ATR+STRUCTURE",
+}
+
+
+# Trade event schemas: (constant fields, value field names). The hot path queues
+# (schema, *values) tuples; the writer task builds the dicts off the WS loop.
+_ENTER_FIELDS = ("trade_id", "side", "entry", "stop", "R", "tp1", "entry_t", "atr", "retest_buf", "bos_level")
+_EMA_FIELDS = ("ema5_fast", "ema5_slow", "ema1_fast", "ema1_slow")
+EV_ENTER_LONG = ({"type": "ENTER"}, _ENTER_FIELDS + ("bos_swing_low",) + _EMA_FIELDS + ("t",))
+EV_ENTER_SHORT = ({"type": "ENTER"}, _ENTER_FIELDS + ("bos_swing_high",) + _EMA_FIELDS + ("t",))
+EV_STOP = ({"type": "STOP", "phase": "PRE_TP1"}, ("trade_id", "side", "stop", "exit_price", "t"))
+EV_TP1 = ({"type": "TP1"}, ("trade_id", "side", "tp1", "tp1_partial_pct", "tp1_t", "t"))
+EV_RUNNER_STOP = ({"type": "RUNNER_EXIT", "reason": "STOP"}, ("trade_id", "side", "runner_stop", "exit_price", "tp1_t", "t"))
+EV_RUNNER_EMA_CROSS = (
+    {"type": "RUNNER_EXIT", "reason": "EMA_CROSS"},
+    ("trade_id", "side", "exit_price", "tp1_t", "ema5_fast", "ema5_slow", "t"),
+)
+EV_RUNNER_TIME = ({"type": "RUNNER_EXIT", "reason": "TIME_STOP"}, ("trade_id", "side", "exit_price", "tp1_t", "t"))
 
 
-def crossed_down(prev_fast, prev_slow, fast, slow) -> bool:
-    return (prev_fast is not None and prev_slow is not None) and (prev_fast >= prev_slow and fast < slow)
+EVENT_BATCH_MAX = 64
+EVENT_FLUSH_S = 0.1
 
+_event_q: asyncio.Queue | None = None  # set by main(); None -> write inline
+_events_dropped = 0
 
-def crossed_up(prev_fast, prev_slow, fast, slow) -> bool:
-    return (prev_fast is not None and prev_slow is not None) and (prev_fast <= prev_slow and fast > slow)
 
+def _event_dict(record: tuple) -> dict:
+    (consts, fields), values = record[0], record[1:]
+    event = dict(consts)
+    event.update(zip(fields, values))
+    return event
 
-def safe_append(event: dict):
+
+def _write_events(records: list):
     """ Never let a filesystem write crash the bot.
     Logs an error to bot logger instead.
     """
     try:
-        append_event(SYMBOL, event)
+        append_events(SYMBOL, [_event_dict(r) for r in records], owned=True)
+    except Exception as e:
+        log({"event": "trade_event_write_failed", "error": str(e), "types": [r[0][0].get("type") for r in records]})
+
+
+def safe_append(schema: tuple, *values):
+    """ Queue a trade event (schema + values) for the background writer; no disk I/O on the WS loop. """
+    global _events_dropped
+    record = (schema, *values)
+    if _event_q is None:
+        _write_events([record])
+        return
+    try:
+        _event_q.put_nowait(record)
+    except asyncio.QueueFull:
+        _events_dropped += 1
+        log({"event": "trade_event_dropped", "type": schema[0].get("type"), "dropped": _events_dropped})
+
+
+async def _event_writer(q: asyncio.Queue):
+    """ Flush queued events in batches of up to EVENT_BATCH_MAX or every EVENT_FLUSH_S. """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await q.get()]
+        deadline = loop.time() + EVENT_FLUSH_S
+        while len(batch) < EVENT_BATCH_MAX:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(q.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # dict build + append + fsync in a worker thread so the event loop keeps draining
+        await asyncio.to_thread(_write_events, batch)
+
+
+# Telegram messages, journal rows and state snapshots from the bar loop: (fn, arg) pairs run in
+# order by one background task, so HTTP/disk latency never holds up the next frame.
+SIDE_Q_MAX = 1000
+
+_side_q: asyncio.Queue | None = None  # set by main(); None -> run inline
+_side_dropped = 0
+
+
+def _defer(fn, arg):
+    """ Queue notify(msg) or a disk write(arg) (journal row, state snapshot) for the side-effect worker. """
+    global _side_dropped
+    # the one place bar-loop notifications are dropped when Telegram isn't configured
+    if fn is notify and not NOTIFY_ENABLED:
+        return
+    if _side_q is None:
+        if fn is notify:
+            notify_bg(arg)
+        else:
+            fn(arg)
+        return
+    try:
+        _side_q.put_nowait((fn, arg))
+    except asyncio.QueueFull:
+        _side_dropped += 1
+        log({"event": "side_effect_dropped", "fn": getattr(fn, "__name__", "?"), "dropped": _side_dropped})
+
+
+async def _side_worker(q: asyncio.Queue):
+    while True:
+        fn, arg = await q.get()
+        try:
+            if fn is notify:
+                await notify(arg)
+            else:
+                await asyncio.to_thread(fn, arg)
+        except Exception as e:
+            log({"event": "side_effect_failed", "fn": getattr(fn, "__name__", "?"), "error": str(e)})
+        # burst handled: push buffered journal rows out now instead of leaving them
+        # in the buffer until a write on the next bar
+        if q.empty():
+            try:
+                await asyncio.to_thread(flush_journal)
+            except Exception as e:
+                log({"event": "side_effect_failed", "fn": "flush_journal", "error": str(e)})
+
+
+STATE_FILE = os.getenv("SIGNAL_STATE_FILE", f"state_{SYMBOL.replace(':', '_')}.json")
+STATE_MAX_AGE_BARS = int(os.getenv("STATE_MAX_AGE_BARS", "12"))  # older snapshots -> full bootstrap
+STATE_VERSION = 2
+
+
+def state_bytes(last_candle_t, candle_5m: CandleBuilder, candle_1h: CandleBuilder, structure) -> bytes | None:
+    """ Snapshot candles + structure so a restart can skip the 300-bar bootstrap.
+    Serialized right away: the column views and structure change with the next update.
+    """
+    try:
+        payload = {
+            "v": STATE_VERSION,
+            "symbol": SYMBOL,
+            "last_candle_t": last_candle_t,
+            # 5m bars up to last_candle_t only: the newest closed bar hasn't been processed yet
+            "candles_5m": candle_5m.snapshot(300, upto=candle_5m.n - 1),
+            "candle_1h": candle_1h.snapshot(200),
+            "structure": vars(structure),
+        }
+        return json_dumps(payload)
     except Exception as e:
-        log({"event": "trade_event_write_failed", "error": str(e), "type": event.get("type")})
+        log({"event": "state_save_failed", "error": str(e)})
+        return None
+
+
+def write_state(data: bytes):
+    """ Atomically replace STATE_FILE with a state_bytes() snapshot.
+    Never raises; a failed write just means the next start bootstraps in full.
+    """
+    try:
+        tmp = STATE_FILE + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, STATE_FILE)
+    except Exception as e:
+        log({"event": "state_save_failed", "error": str(e)})
+
+
+def load_state() -> dict | None:
+    """ Return the saved snapshot if it belongs to SYMBOL and is recent enough to gap-fill. """
+    try:
+        with open(STATE_FILE, "rb") as f:
+            state = json_loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log({"event": "state_load_failed", "error": str(e)})
+        return None
+
+    if state.get("v") != STATE_VERSION or state.get("symbol") != SYMBOL or not state.get("last_candle_t"):
+        return None
+    if time.time() - state["last_candle_t"] > STATE_MAX_AGE_BARS * TF_SECONDS:
+        return None
+    return state
 
 
 class StructureState:
@@ -327,76 +628,54 @@ class SignalTradeState:
         self.lowest_low_since_tp1 = None
         self.struct_stop = None
         self.atr_stop = None
-        self.prev_efast5 = None
-        self.prev_eslow5 = None
+        self.prev_spread5 = math.nan  # ema_fast5 - ema_slow5 on the previous bar (NaN: unknown)
 
     def clear(self):
         self.__init__()
 
 
-async def bootstrap_candles(symbol: str, tf_sec: int, limit=300):
-    """
-    Bootstrap from hyperliquid REST-like endpoint (via Info API endpoint through httpx).
-    Uses the same candle format as CandleBuilder.
-    """
-    # NOTE: This is your existing bootstrap; leaving it intact.
-    # If you want volume/VWAP/POC later, this is where we'd extend.
-    url = "https://api.hyperliquid.xyz/info"
-    now = int(time.time() * 1000)
-    start = now - (limit * tf_sec * 1000)
-
-    payload = {
-        "type": "candleSnapshot",
-        "req": {
-            "coin": symbol,
-            "interval": f"{tf_sec // 60}m" if tf_sec < 3600 else "1h",
-            "startTime": start,
-            "endTime": now,
-        },
-    }
-
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(url, json=payload)
-        r.raise_for_status()
-        data = r.json()
-
-    out = []
-    for c in data:
-        t = int(c["t"] / 1000)
-        out.append({
-            "t": t - (t % tf_sec),
-            "o": float(c["o"]),
-            "h": float(c["h"]),
-            "l": float(c["l"]),
-            "c": float(c["c"]),
-        })
-    return out
-
-
 async def main():
     structure = StructureState()
     sig = SignalTradeState()
 
-    # Keep profiles in place (unused for stop now, but harmless)
-    _profile = SYMBOL_PROFILES.get(SYMBOL, DEFAULT_PROFILE)
-
     candle_5m = CandleBuilder(TF_SECONDS)
     candle_1h = CandleBuilder(ONE_HOUR)
+    ema_fast5, ema_slow5 = EmaTracker(EMA_FAST), EmaTracker(EMA_SLOW)
+    ema_fast1, ema_slow1 = EmaTracker(EMA_FAST), EmaTracker(EMA_SLOW)
+    atr5 = AtrTracker(ATR_LEN)
 
     last_candle_t = None
 
-    # --- bootstrap ---
-    history = await bootstrap_candles(SYMBOL, TF_SECONDS, limit=300)
-    if history:
-        candle_5m.candles = history[:-1]
-        candle_5m.current = history[-1]
-        last_candle_t = candle_5m.candles[-1]["t"] if candle_5m.candles else None
-
-        # build 1h from historical 5m closes
-        for c in candle_5m.candles[-240:]:
-            candle_1h.update(c["t"] + TF_SECONDS, c["c"])
-
-    log({"event": "bootstrapped", "candles_5m": len(candle_5m.candles), "candles_1h": len(candle_1h.candles)})
+    # --- bootstrap (resume from snapshot + gap candles when it is fresh) ---
+    state = load_state()
+    if state:
+        candle_5m.restore(state["candles_5m"])
+        candle_1h.restore(state["candle_1h"])
+        vars(structure).update(state["structure"])
+        last_candle_t = state["last_candle_t"]
+
+        gap_bars = int((time.time() - last_candle_t) // TF_SECONDS) + 2
+        gap = await bootstrap_candles(SYMBOL, TF_SECONDS, limit=gap_bars)
+        newer = gap.t > last_candle_t
+        gap_bars = list(zip(*(x[newer].tolist() for x in (gap.t, gap.o, gap.h, gap.l, gap.c))))
+        for bar in gap_bars:
+            if candle_5m.cur_t is not None:
+                candle_1h.update((candle_5m.cur_t + TF_SECONDS) * NS, candle_5m.cur_c)
+            candle_5m.append_bar(*bar)
+        last_candle_t = candle_5m.last_t
+        log({"event": "state_resumed", "gap_candles": len(gap_bars)})
+
+    history = None if state else await bootstrap_candles(SYMBOL, TF_SECONDS, limit=300)
+    if history is not None and len(history):
+        candle_5m.seed(history)
+        last_candle_t = candle_5m.last_t
+
+        # build 1h from historical 5m closes (stamped at bar close, as in the live loop)
+        closed_t = history.t[:-1][-240:]
+        closed_c = history.c[:-1][-240:]
+        candle_1h.seed(aggregate_closes(closed_t + TF_SECONDS, closed_c, ONE_HOUR))
+
+    log({"event": "bootstrapped", "candles_5m": len(candle_5m), "candles_1h": len(candle_1h)})
 
     sub_msg = {"method": "subscribe", "subscription": {"type": "allMids"}}
     log({"event": "startup", "ws": WS_URL, "symbol": SYMBOL, "mode": "signal_only"})
@@ -408,88 +687,102 @@ async def main():
     journal = Journal(session_id=session_id)
     log({"event": "session_started", "session_id": session_id, "symbol": SYMBOL})
 
+    # --- trade events: written by a background task ---
+    global _event_q
+    _event_q = asyncio.Queue(maxsize=10000)
+    asyncio.create_task(_event_writer(_event_q))
+
+    # --- notifications + journal rows from the bar loop: also background ---
+    global _side_q
+    _side_q = asyncio.Queue(maxsize=SIDE_Q_MAX)
+    asyncio.create_task(_side_worker(_side_q))
+
     # --- optional grid bot ---
     global grid
-    grid = None
-    if os.getenv("GRID_ENABLED", "0") == "1":
-        grid = GridBot(SYMBOL, ENV)
+    grid = GridBot(SYMBOL, ENV) if GRID_ENABLED else None
+    if grid is not None:
         asyncio.create_task(grid.loop())
 
     last_hb = 0
+    last_price_str = None
+    mid_needle_b = mid_needle(SYMBOL)
+    last_decision_key = None
+    decisions_coalesced = 0
+    buf_atr = None  # ATR the retest/BE/structure/seatbelt buffers were derived from
+    backoff = WS_BACKOFF_BASE
+    consecutive_failures = 0
 
     while True:
         try:
-            async with websockets.connect(WS_URL, ping_interval=20, ping_timeout=20) as ws:
-                await ws.send(json.dumps(sub_msg))
+            async with websockets.connect(WS_URL, ping_interval=20, ping_timeout=20, max_size=2**20, max_queue=32, compression=None) as ws:
+                await ws.send(json_dumps(sub_msg).decode())
+                feed = FrameBatch(ws)
 
                 while True:
-                    msg = await ws.recv()
-                    data = json.loads(msg)
-
-                    if data.get("channel") != "allMids":
-                        continue
-
-                    mids = data.get("data", {}).get("mids", {})
-                    if SYMBOL not in mids:
+                    # hyperliquid only sends text frames; the feed hands over raw bytes (no str decode).
+                    # Every mid in the batch is folded into the candle (keeps true h/l), the bar logic runs once.
+                    batch = await feed.get_batch()
+                    if consecutive_failures:
+                        # first data after a reconnect: the link is healthy again
+                        backoff = WS_BACKOFF_BASE
+                        consecutive_failures = 0
+                    new_bar = False
+                    for ts_ns, msg in batch:
+                        # slice our mid straight out of the frame: no dict of every coin
+                        price_str = all_mids_price(msg, mid_needle_b)
+                        if price_str is None:
+                            continue
+
+                        # repeated prints inside the open bar can't change it: skip float() + update
+                        if price_str == last_price_str and candle_5m.bucket(ts_ns) == candle_5m.cur_t:
+                            continue
+                        last_price_str = price_str
+                        if candle_5m.update(ts_ns, float(price_str)):
+                            new_bar = True
+
+                    # most batches only move the open bar: nothing else to do
+                    if not new_bar:
                         continue
-
-                    price = float(mids[SYMBOL])
-                    ts = time.time()
-
-                    candle_5m.update(ts, price)
-
                     closed = candle_5m.last_closed()
-                    if not closed:
-                        continue
 
-                    if closed["t"] == last_candle_t:
-                        continue
+                    # persist state as of the previous (fully processed) bar: 1h + structure haven't seen `closed` yet
+                    # (serialized here, written by the side worker: no disk I/O on the WS loop)
+                    if last_candle_t is not None:
+                        state_data = state_bytes(last_candle_t, candle_5m, candle_1h, structure)
+                        if state_data is not None:
+                            _defer(write_state, state_data)
                     last_candle_t = closed["t"]
+                    ct, co, ch, cl, cc = closed["t"], closed["o"], closed["h"], closed["l"], closed["c"]
 
                     # --- journal: 5m snapshot (OHLC only; volume/POC/VWAP not available from mids stream) ---
-                    journal.write_snapshot({
-                        "symbol": SYMBOL,
-                        "tf": "5m",
-                        "open": closed.get("o"),
-                        "high": closed.get("h"),
-                        "low": closed.get("l"),
-                        "close": closed.get("c"),
-                        "volume": "",
-                        "ema9": "",
-                        "ema21": "",
-                        "vwap": "",
-                        "poc": "",
-                        "rsi": "",
-                    })
+                    _defer(journal.write_snapshot, SnapshotRow(SYMBOL, "5m", co, ch, cl, cc))
 
                     # build 1h from 5m closes
-                    candle_1h.update(closed["t"] + TF_SECONDS, closed["c"])
+                    candle_1h.update((ct + TF_SECONDS) * NS, cc)
 
                     # --- heartbeat ---
-                    now = int(time.time())
+                    now_ns = batch[-1][0]  # one clock read per frame, taken by the feed
+                    now = now_ns // NS
                     if now - last_hb >= 3600:
                         last_hb = now
                         log({"event": "heartbeat", "symbol": SYMBOL})
 
                     # ---- need enough candles ----
-                    if len(candle_5m.candles) < 120 or len(candle_1h.candles) < 40:
+                    if len(candle_5m) < 120 or len(candle_1h) < 40:
                         continue
 
-                    c5_full = candle_5m.candles
-                    c1 = candle_1h.candles
-
-                    # Use a consistent 5m window (align indices for pivots + timestamps)
-                    c5w = c5_full[-300:]
-                    closes5 = [c["c"] for c in c5w]
-                    highs5 = [c["h"] for c in c5w]
-                    lows5 = [c["l"] for c in c5w]
-                    closes1 = [c["c"] for c in c1][-200:]
-
-                    # EMAs
-                    efast5 = ema(closes5[-(EMA_FAST * 4):], EMA_FAST)
-                    eslow5 = ema(closes5[-(EMA_SLOW * 4):], EMA_SLOW)
-                    efast1 = ema(closes1[-(EMA_FAST * 4):], EMA_FAST)
-                    eslow1 = ema(closes1[-(EMA_SLOW * 4):], EMA_SLOW)
+                    # Use a consistent 5m window (align indices for pivots + timestamps); views, no copies
+                    c5w = candle_5m.window(300)
+                    closes5 = c5w.c
+                    highs5 = c5w.h
+                    lows5 = c5w.l
+                    c1w = candle_1h.window(200)
+
+                    # EMAs: incremental per closed bar (1h ones only move when a 1h bar closes)
+                    efast5 = ema_fast5.advance(c5w.t, closes5)
+                    eslow5 = ema_slow5.advance(c5w.t, closes5)
+                    efast1 = ema_fast1.advance(c1w.t, c1w.c)
+                    eslow1 = ema_slow1.advance(c1w.t, c1w.c)
                     if None in (efast5, eslow5, efast1, eslow1):
                         continue
 
@@ -497,289 +790,168 @@ async def main():
                     biasShort = efast1 < eslow1
                     emaTrendLong = efast5 > eslow5
                     emaTrendShort = efast5 < eslow5
+                    spread5 = efast5 - eslow5
 
-                    # ATR + buffers (use same window list)
-                    a = atr_from_candles(c5w, length=ATR_LEN)
-                    if a is None:
-                        continue
-                    retest_buf = a * RETEST_BUF_ATR
-                    be_buf = a * BE_BUF_ATR
-                    struct_pad = a * STRUCT_PAD_ATR
-                    atr_seatbelt_dist = a * ATR_SEATBELT_MULT
-
-                    # pivots (confirmed) on window
-                    idx_hi = last_confirmed_swing_high(highs5, PIVOT_L)
-                    idx_lo = last_confirmed_swing_low(lows5, PIVOT_L)
-                    if idx_hi is None or idx_lo is None:
+                    # Wilder ATR (O(1) per bar) + both confirmed pivots in one pass
+                    a = atr5.advance(c5w.t, highs5, lows5, closes5)
+                    idx_hi, idx_lo = last_swings(highs5, lows5, PIVOT_L)
+                    if a is None or idx_hi is None or idx_lo is None:
                         continue
+                    # ATR drifts slowly: only re-derive the buffers on a material change
+                    if buf_atr is None or abs(a - buf_atr) > ATR_REFRESH_REL * buf_atr:
+                        buf_atr = a
+                        retest_buf = a * RETEST_BUF_ATR
+                        be_buf = a * BE_BUF_ATR
+                        struct_pad = a * STRUCT_PAD_ATR
+                        atr_seatbelt_dist = a * ATR_SEATBELT_MULT
 
-                    lastSwingHigh = highs5[idx_hi]
-                    lastSwingLow = lows5[idx_lo]
+                    lastSwingHigh = float(highs5[idx_hi])
+                    lastSwingLow = float(lows5[idx_lo])
 
-                    prev_close = c5w[-2]["c"]
-                    bosUp = (prev_close <= lastSwingHigh) and (closed["c"] > lastSwingHigh)
-                    bosDown = (prev_close >= lastSwingLow) and (closed["c"] < lastSwingLow)
+                    prev_close = float(closes5[-2])
+                    bosUp = (prev_close <= lastSwingHigh) and (cc > lastSwingHigh)
+                    bosDown = (prev_close >= lastSwingLow) and (cc < lastSwingLow)
 
                     # ============================
                     # 1) Manage active signal first
                     # ============================
                     if sig.active:
-                        # PRE_TP1: initial stop + TP1
+                        # PRE_TP1: initial stop + TP1 (side is fixed for the signal's lifetime)
                         if sig.phase == "PRE_TP1":
                             if sig.side == "LONG":
-                                if closed["l"] <= sig.stop_init:
-                                    await notify(f"{SYMBOL} LONG invalidated ❌ stop tagged {sig.stop_init:.2f}")
-                                    safe_append({
-                                        "type": "STOP",
-                                        "trade_id": sig.trade_id,
-                                        "side": sig.side,
-                                        "phase": "PRE_TP1",
-                                        "stop": sig.stop_init,
-                                        "exit_price": sig.stop_init,
-                                        "t": closed["t"],
-                                    })
-                                    sig.clear()
-
-                                elif (not sig.tp1_sent) and closed["h"] >= sig.tp1:
-                                    sig.tp1_sent = True
-                                    sig.tp1_t = closed["t"]
-
-                                    await notify(f"{SYMBOL} LONG TP1 ✅ hit {sig.tp1:.2f} (paper close {int(TP1_PARTIAL_PCT*100)}%)")
-                                    safe_append({
-                                        "type": "TP1",
-                                        "trade_id": sig.trade_id,
-                                        "side": sig.side,
-                                        "tp1": sig.tp1,
-                                        "tp1_partial_pct": TP1_PARTIAL_PCT,
-                                        "tp1_t": sig.tp1_t,
-                                        "t": closed["t"],
-                                    })
-
-                                    sig.phase = "RUNNER"
-                                    sig.highest_high_since_tp1 = closed["h"]
-                                    sig.lowest_low_since_tp1 = closed["l"]
-                                    sig.struct_stop = None
-                                    sig.atr_stop = None
-
-                            else:  # SHORT
-                                if closed["h"] >= sig.stop_init:
-                                    await notify(f"{SYMBOL} SHORT invalidated ❌ stop tagged {sig.stop_init:.2f}")
-                                    safe_append({
-                                        "type": "STOP",
-                                        "trade_id": sig.trade_id,
-                                        "side": sig.side,
-                                        "phase": "PRE_TP1",
-                                        "stop": sig.stop_init,
-                                        "exit_price": sig.stop_init,
-                                        "t": closed["t"],
-                                    })
-                                    sig.clear()
-
-                                elif (not sig.tp1_sent) and closed["l"] <= sig.tp1:
-                                    sig.tp1_sent = True
-                                    sig.tp1_t = closed["t"]
-
-                                    await notify(f"{SYMBOL} SHORT TP1 ✅ hit {sig.tp1:.2f} (paper close {int(TP1_PARTIAL_PCT*100)}%)")
-                                    safe_append({
-                                        "type": "TP1",
-                                        "trade_id": sig.trade_id,
-                                        "side": sig.side,
-                                        "tp1": sig.tp1,
-                                        "tp1_partial_pct": TP1_PARTIAL_PCT,
-                                        "tp1_t": sig.tp1_t,
-                                        "t": closed["t"],
-                                    })
-
-                                    sig.phase = "RUNNER"
-                                    sig.highest_high_since_tp1 = closed["h"]
-                                    sig.lowest_low_since_tp1 = closed["l"]
-                                    sig.struct_stop = None
-                                    sig.atr_stop = None
-
-                        # RUNNER: best-of stops + EMA cross exit + time stop
-                        elif sig.phase == "RUNNER":
-                            sig.highest_high_since_tp1 = max(sig.highest_high_since_tp1, closed["h"])
-                            sig.lowest_low_since_tp1 = min(sig.lowest_low_since_tp1, closed["l"])
-
-                            # BE stop
-                            be_stop = (sig.entry + be_buf) if sig.side == "LONG" else (sig.entry - be_buf)
-
-                            # Structure trailing AFTER TP1 using timestamps (robust)
-                            if sig.tp1_t is not None:
-                                if sig.side == "LONG":
-                                    pidx = last_confirmed_swing_low(lows5, PIVOT_L)
-                                    if pidx is not None and c5w[pidx]["t"] >= sig.tp1_t:
-                                        new_struct_stop = lows5[pidx] - struct_pad
-                                        sig.struct_stop = max(sig.struct_stop, new_struct_stop) if sig.struct_stop is not None else new_struct_stop
-                                else:
-                                    pidx = last_confirmed_swing_high(highs5, PIVOT_L)
-                                    if pidx is not None and c5w[pidx]["t"] >= sig.tp1_t:
-                                        new_struct_stop = highs5[pidx] + struct_pad
-                                        sig.struct_stop = min(sig.struct_stop, new_struct_stop) if sig.struct_stop is not None else new_struct_stop
-
-                            # ATR seatbelt trail
-                            if sig.side == "LONG":
-                                new_atr_stop = sig.highest_high_since_tp1 - atr_seatbelt_dist
-                                sig.atr_stop = max(sig.atr_stop, new_atr_stop) if sig.atr_stop is not None else new_atr_stop
+                                stopped = cl <= sig.stop_init
+                                hit_tp1 = (not sig.tp1_sent) and ch >= sig.tp1
                             else:
-                                new_atr_stop = sig.lowest_low_since_tp1 + atr_seatbelt_dist
-                                sig.atr_stop = min(sig.atr_stop, new_atr_stop) if sig.atr_stop is not None else new_atr_stop
+                                stopped = ch >= sig.stop_init
+                                hit_tp1 = (not sig.tp1_sent) and cl <= sig.tp1
+
+                            if stopped:
+                                _defer(notify, f"{SYMBOL} {sig.side} invalidated ❌ stop tagged {sig.stop_init:.2f}")
+                                safe_append(
+                                    EV_STOP,
+                                    sig.trade_id,
+                                    sig.side,
+                                    sig.stop_init,
+                                    sig.stop_init,
+                                    ct,
+                                )
+                                sig.clear()
+
+                            elif hit_tp1:
+                                sig.tp1_sent = True
+                                sig.tp1_t = ct
+
+                                _defer(notify, f"{SYMBOL} {sig.side} TP1 ✅ hit {sig.tp1:.2f} (paper close {int(TP1_PARTIAL_PCT*100)}%)")
+                                safe_append(
+                                    EV_TP1,
+                                    sig.trade_id,
+                                    sig.side,
+                                    sig.tp1,
+                                    TP1_PARTIAL_PCT,
+                                    sig.tp1_t,
+                                    ct,
+                                )
 
-                            # Best protection stop
-                            if sig.side == "LONG":
-                                runner_stop = be_stop
-                                if sig.struct_stop is not None:
-                                    runner_stop = max(runner_stop, sig.struct_stop)
-                                if sig.atr_stop is not None:
-                                    runner_stop = max(runner_stop, sig.atr_stop)
-
-                                # stop tagged?
-                                if closed["l"] <= runner_stop:
-                                    await notify(f"{SYMBOL} LONG RUNNER 🏁 stop hit {runner_stop:.2f}")
-                                    safe_append({
-                                        "type": "RUNNER_EXIT",
-                                        "trade_id": sig.trade_id,
-                                        "side": sig.side,
-                                        "reason": "STOP",
-                                        "runner_stop": runner_stop,
-                                        "exit_price": runner_stop,
-                                        "tp1_t": sig.tp1_t,
-                                        "t": closed["t"],
-                                    })
-                                    sig.clear()
-                                else:
-                                    ema_cross_exit = crossed_down(sig.prev_efast5, sig.prev_eslow5, efast5, eslow5)
-                                    time_exit = (sig.tp1_t is not None) and ((closed["t"] - sig.tp1_t) >= RUNNER_TIME_STOP_BARS * TF_SECONDS)
-
-                                    if ema_cross_exit:
-                                        await notify(f"{SYMBOL} LONG RUNNER 🏁 EMA cross exit (9<21)")
-                                        safe_append({
-                                            "type": "RUNNER_EXIT",
-                                            "trade_id": sig.trade_id,
-                                            "side": sig.side,
-                                            "reason": "EMA_CROSS",
-                                            "exit_price": closed["c"],
-                                            "tp1_t": sig.tp1_t,
-                                            "ema5_fast": efast5,
-                                            "ema5_slow": eslow5,
-                                            "t": closed["t"],
-                                        })
-                                        sig.clear()
-                                    elif time_exit:
-                                        await notify(f"{SYMBOL} LONG RUNNER 🏁 time stop exit (~60 mins)")
-                                        safe_append({
-                                            "type": "RUNNER_EXIT",
-                                            "trade_id": sig.trade_id,
-                                            "side": sig.side,
-                                            "reason": "TIME_STOP",
-                                            "exit_price": closed["c"],
-                                            "tp1_t": sig.tp1_t,
-                                            "t": closed["t"],
-                                        })
-                                        sig.clear()
-
-                            else:  # SHORT
-                                runner_stop = be_stop
-                                if sig.struct_stop is not None:
-                                    runner_stop = min(runner_stop, sig.struct_stop)
-                                if sig.atr_stop is not None:
-                                    runner_stop = min(runner_stop, sig.atr_stop)
-
-                                if closed["h"] >= runner_stop:
-                                    await notify(f"{SYMBOL} SHORT RUNNER 🏁 stop hit {runner_stop:.2f}")
-                                    safe_append({
-                                        "type": "RUNNER_EXIT",
-                                        "trade_id": sig.trade_id,
-                                        "side": sig.side,
-                                        "reason": "STOP",
-                                        "runner_stop": runner_stop,
-                                        "exit_price": runner_stop,
-                                        "tp1_t": sig.tp1_t,
-                                        "t": closed["t"],
-                                    })
-                                    sig.clear()
-                                else:
-                                    ema_cross_exit = crossed_up(sig.prev_efast5, sig.prev_eslow5, efast5, eslow5)
-                                    time_exit = (sig.tp1_t is not None) and ((closed["t"] - sig.tp1_t) >= RUNNER_TIME_STOP_BARS * TF_SECONDS)
-
-                                    if ema_cross_exit:
-                                        await notify(f"{SYMBOL} SHORT RUNNER 🏁 EMA cross exit (9>21)")
-                                        safe_append({
-                                            "type": "RUNNER_EXIT",
-                                            "trade_id": sig.trade_id,
-                                            "side": sig.side,
-                                            "reason": "EMA_CROSS",
-                                            "exit_price": closed["c"],
-                                            "tp1_t": sig.tp1_t,
-                                            "ema5_fast": efast5,
-                                            "ema5_slow": eslow5,
-                                            "t": closed["t"],
-                                        })
-                                        sig.clear()
-                                    elif time_exit:
-                                        await notify(f"{SYMBOL} SHORT RUNNER 🏁 time stop exit (~60 mins)")
-                                        safe_append({
-                                            "type": "RUNNER_EXIT",
-                                            "trade_id": sig.trade_id,
-                                            "side": sig.side,
-                                            "reason": "TIME_STOP",
-                                            "exit_price": closed["c"],
-                                            "tp1_t": sig.tp1_t,
-                                            "t": closed["t"],
-                                        })
-                                        sig.clear()
-
-                    # Update prev EMA values for next-bar cross detection
-                    sig.prev_efast5 = efast5
-                    sig.prev_eslow5 = eslow5
+                                sig.phase = "RUNNER"
+                                sig.highest_high_since_tp1 = ch
+                                sig.lowest_low_since_tp1 = cl
+                                # identity of the side's max/min reduction = "not set yet"
+                                unset = -math.inf if sig.side == "LONG" else math.inf
+                                sig.struct_stop = unset
+                                sig.atr_stop = unset
+
+                        # RUNNER: best-of stops + EMA cross exit + time stop (arithmetic in _update_runner)
+                        elif sig.phase == "RUNNER":
+                            side = 1 if sig.side == "LONG" else -1
+                            # structure trails off the newest confirmed swing against the trade
+                            pidx = idx_lo if side == 1 else idx_hi
+                            pivot_px = float(lows5[pidx]) if side == 1 else float(highs5[pidx])
+                            (
+                                sig.struct_stop, sig.atr_stop,
+                                sig.highest_high_since_tp1, sig.lowest_low_since_tp1,
+                                runner_stop, exit_code,
+                            ) = _update_runner(
+                                side, ch, cl, sig.entry,
+                                be_buf, struct_pad, atr_seatbelt_dist,
+                                sig.struct_stop, sig.atr_stop,
+                                sig.highest_high_since_tp1, sig.lowest_low_since_tp1,
+                                pivot_px, int(c5w.t[pidx]), sig.tp1_t, ct,
+                                RUNNER_TIME_STOP_BARS * TF_SECONDS,
+                                sig.prev_spread5, spread5,
+                            )
+
+                            if exit_code == RUNNER_EXIT_STOP:
+                                _defer(notify, f"{SYMBOL} {sig.side} RUNNER 🏁 stop hit {runner_stop:.2f}")
+                                safe_append(
+                                    EV_RUNNER_STOP,
+                                    sig.trade_id,
+                                    sig.side,
+                                    runner_stop,
+                                    runner_stop,
+                                    sig.tp1_t,
+                                    ct,
+                                )
+                                sig.clear()
+                            elif exit_code == RUNNER_EXIT_EMA_CROSS:
+                                _defer(notify, f"{SYMBOL} {sig.side} RUNNER 🏁 EMA cross exit ({'9<21' if side == 1 else '9>21'})")
+                                safe_append(
+                                    EV_RUNNER_EMA_CROSS,
+                                    sig.trade_id,
+                                    sig.side,
+                                    cc,
+                                    sig.tp1_t,
+                                    efast5,
+                                    eslow5,
+                                    ct,
+                                )
+                                sig.clear()
+                            elif exit_code == RUNNER_EXIT_TIME:
+                                _defer(notify, f"{SYMBOL} {sig.side} RUNNER 🏁 time stop exit (~60 mins)")
+                                safe_append(
+                                    EV_RUNNER_TIME,
+                                    sig.trade_id,
+                                    sig.side,
+                                    cc,
+                                    sig.tp1_t,
+                                    ct,
+                                )
+                                sig.clear()
+
+                    # Update prev EMA spread for next-bar cross detection
+                    sig.prev_spread5 = spread5
 
                     # ============================
                     # 2) Structure state machine (only if not in active trade)
                     # ============================
                     if not sig.active:
-                        # If bias/trend flips while waiting, drop setup
-                        if structure.waitingRetest:
-                            if structure.direction == "LONG" and (not biasLong or not emaTrendLong):
-                                structure.reset()
-                            elif structure.direction == "SHORT" and (not biasShort or not emaTrendShort):
-                                structure.reset()
-
-                        # Arm BOS -> WAIT_RETEST
-                        if bosUp and biasLong and emaTrendLong:
-                            structure.reset()
-                            structure.direction = "LONG"
-                            structure.bosLevel = lastSwingHigh
-                            structure.waitingRetest = True
-                            structure.retestRef = None
-                            structure.accCount = 0
-                            structure.bosSwingLow = lastSwingLow
-
-                        elif bosDown and biasShort and emaTrendShort:
-                            structure.reset()
-                            structure.direction = "SHORT"
-                            structure.bosLevel = lastSwingLow
-                            structure.waitingRetest = True
-                            structure.retestRef = None
-                            structure.accCount = 0
-                            structure.bosSwingHigh = lastSwingHigh
-
-                        # Retest
-                        if structure.waitingRetest and structure.bosLevel is not None:
-                            if structure.direction == "LONG":
-                                if closed["l"] <= (structure.bosLevel + retest_buf):
-                                    structure.retestRef = structure.bosLevel
-                                    structure.accCount = 0
-                            else:
-                                if closed["h"] >= (structure.bosLevel - retest_buf):
-                                    structure.retestRef = structure.bosLevel
-                                    structure.accCount = 0
-
-                        # Acceptance closes
-                        if structure.waitingRetest and structure.retestRef is not None:
-                            if structure.direction == "LONG":
-                                structure.accCount = structure.accCount + 1 if closed["c"] > structure.retestRef else 0
-                            else:
-                                structure.accCount = structure.accCount + 1 if closed["c"] < structure.retestRef else 0
+                        # idle bar (nothing armed, no BOS): the machine can't move and the
+                        # report would be a plain NO_TRADE; only every DECISION_SAMPLE_BARS-th
+                        # bar (top of the hour) still goes through to keep a heartbeat row
+                        if (not structure.waitingRetest and not bosUp and not bosDown
+                                and (ct // TF_SECONDS) % DECISION_SAMPLE_BARS):
+                            continue
+
+                        # bias-flip drop, BOS arming, retest and acceptance (arithmetic in _step_structure)
+                        st_side, bos_level, retest_ref, acc_count, armed = _step_structure(
+                            _SIDE_CODE[structure.direction],
+                            math.nan if structure.bosLevel is None else structure.bosLevel,
+                            math.nan if structure.retestRef is None else structure.retestRef,
+                            structure.accCount,
+                            biasLong and emaTrendLong, biasShort and emaTrendShort,
+                            bosUp, bosDown, lastSwingHigh, lastSwingLow,
+                            ch, cl, cc, retest_buf,
+                        )
+                        if armed:
+                            structure.bosSwingLow = lastSwingLow if armed == 1 else None
+                            structure.bosSwingHigh = lastSwingHigh if armed == -1 else None
+                        elif st_side == 0:
+                            structure.bosSwingLow = None
+                            structure.bosSwingHigh = None
+                        structure.direction = _SIDE_NAME[st_side]
+                        structure.waitingRetest = st_side != 0
+                        structure.bosLevel = bos_level if st_side != 0 else None
+                        structure.retestRef = None if math.isnan(retest_ref) else retest_ref
+                        structure.accCount = acc_count
 
                         accepted = structure.waitingRetest and structure.retestRef is not None and structure.accCount >= ACCEPT_BARS
 
@@ -830,77 +1002,82 @@ async def main():
                         else:
                             action = "NO_TRADE"
 
+                        # stop sits 0.10 ATR beyond the BOS swing (shared by the report and the entry)
+                        stop_pad = a * 0.10
+
                         # Risk plan (only filled on ENTER_*)
-                        entry_px = closed["c"] if action in ("ENTER_LONG", "ENTER_SHORT") else ""
+                        entry_px = cc if action in ("ENTER_LONG", "ENTER_SHORT") else ""
                         stop_px = ""
                         tp1_px = ""
                         rr_to_tp1 = ""
                         inv_px = ""
 
                         if action == "ENTER_LONG" and structure.bosSwingLow is not None:
-                            stop_px = float(structure.bosSwingLow) - (a * 0.10)
+                            stop_px = float(structure.bosSwingLow) - stop_pad
                             inv_px = stop_px
                             R_tmp = float(entry_px) - stop_px
                             if R_tmp > 0:
                                 tp1_px = float(entry_px) + TP1_R_MULT * R_tmp
                                 rr_to_tp1 = 1.0
                         elif action == "ENTER_SHORT" and structure.bosSwingHigh is not None:
-                            stop_px = float(structure.bosSwingHigh) + (a * 0.10)
+                            stop_px = float(structure.bosSwingHigh) + stop_pad
                             inv_px = stop_px
                             R_tmp = stop_px - float(entry_px)
                             if R_tmp > 0:
                                 tp1_px = float(entry_px) - TP1_R_MULT * R_tmp
                                 rr_to_tp1 = 1.0
 
-                        confidence = int(100 * (len(set(gates_passed)) / max(1, len(set(gates_required)))))
-
-                        report = {
-                            "symbol": SYMBOL,
-                            "mode": "signal_only",
-                            "strategy": "BOS_RETEST_ACCEPT_V1",
-                            "data_fresh_ms": int((time.time() - (closed["t"] + TF_SECONDS)) * 1000),
-                            "px_last": closed["c"],
-                            "spread_bps": "",
-                            "vwap_5m": "",
-                            "poc_5m": "",
-                            "vwap_1h": "",
-                            "poc_1h": "",
-                            "ema9_1h": efast1,
-                            "ema21_1h": eslow1,
-                            "bias_1h": "LONG" if biasLong else ("SHORT" if biasShort else "NEUTRAL"),
-                            "bias_reason": "ema9>ema21" if biasLong else ("ema9<ema21" if biasShort else "flat"),
-                            "rsi_1h": "",
-                            "bos_dir": "UP" if bosUp else ("DOWN" if bosDown else "NONE"),
-                            "bos_level": structure.bosLevel or "",
-                            "retest_level": structure.retestRef or "",
-                            "retest_state": "TOUCHED" if structure.retestRef is not None else ("ARMED" if structure.waitingRetest else "NONE"),
-                            "acceptance_bars": structure.accCount or 0,
-                            "acceptance_required": ACCEPT_BARS,
-                            "acceptance_state": "PASS" if accepted else ("FAIL" if structure.retestRef is not None else "NA"),
-                            "vol_5m": "",
-                            "vol_ma_20": "",
-                            "vol_state": "NA",
-                            "vol_reason": "",
-                            "entry_plan": "LIMIT" if action in ("ENTER_LONG", "ENTER_SHORT") else "NONE",
-                            "entry_px": entry_px,
-                            "invalidation_px": inv_px,
-                            "stop_px": stop_px,
-                            "tp1_px": tp1_px,
-                            "runner_trail": "ATR+STRUCTURE",
-                            "rr_to_tp1": rr_to_tp1,
-                            "gates_required": gates_required,
-                            "gates_passed": sorted(set(gates_passed)),
-                            "gates_failed": sorted(set(gates_failed)),
-                            "action": action,
-                            "confidence": confidence,
-                            "notes": "",
-                        }
-
-                        journal.write_decision(report)
+                        # gate lists deduped/sorted once: shared by the report, confidence and trade row
+                        gp = sorted(set(gates_passed))
+                        gf = sorted(set(gates_failed))
+                        confidence = int(100 * (len(gp) / max(1, len(set(gates_required)))))
+
+                        # WATCH/NO_TRADE bars that repeat the previous row's state are coalesced
+                        # (no report is built for them); the hourly sample bar still writes, with
+                        # the count of rows it stands for
+                        decision_key = (action, working_dir, structure.bosLevel, structure.retestRef,
+                                        structure.accCount, bosUp, bosDown, biasLong, biasShort,
+                                        emaTrendLong, emaTrendShort)
+                        if (action in ("ENTER_LONG", "ENTER_SHORT") or decision_key != last_decision_key
+                                or not (ct // TF_SECONDS) % DECISION_SAMPLE_BARS):
+                            bias_i = biasLong + 2 * biasShort
+                            touched = structure.retestRef is not None
+                            report = {
+                                **_REPORT_CONST,
+                                "data_fresh_ms": now_ns // 1_000_000 - (ct + TF_SECONDS) * 1000,
+                                "px_last": cc,
+                                "ema9_1h": efast1,
+                                "ema21_1h": eslow1,
+                                "bias_1h": _BIAS_LABEL[bias_i],
+                                "bias_reason": _BIAS_REASON[bias_i],
+                                "bos_dir": _BOS_LABEL[bosUp + 2 * bosDown],
+                                "bos_level": structure.bosLevel or "",
+                                "retest_level": structure.retestRef or "",
+                                "retest_state": _RETEST_LABEL[structure.waitingRetest + 2 * touched],
+                                "acceptance_bars": structure.accCount or 0,
+                                "acceptance_state": _ACCEPT_LABEL[touched + 2 * accepted],
+                                "entry_plan": "LIMIT" if action in ("ENTER_LONG", "ENTER_SHORT") else "NONE",
+                                "entry_px": entry_px,
+                                "invalidation_px": inv_px,
+                                "stop_px": stop_px,
+                                "tp1_px": tp1_px,
+                                "rr_to_tp1": rr_to_tp1,
+                                "gates_required": gates_required,
+                                "gates_passed": gp,
+                                "gates_failed": gf,
+                                "action": action,
+                                "confidence": confidence,
+                                "notes": f"coalesced={decisions_coalesced}" if decisions_coalesced else "",
+                            }
+                            decisions_coalesced = 0
+                            last_decision_key = decision_key
+                            _defer(journal.write_decision, report)
+                        else:
+                            decisions_coalesced += 1
 
                         # If we're signaling an entry, also write a trade-intent row (paper journal)
                         if action in ("ENTER_LONG", "ENTER_SHORT"):
-                            journal.write_trade({
+                            _defer(journal.write_trade, {
                                 "symbol": SYMBOL,
                                 "side": "LONG" if action == "ENTER_LONG" else "SHORT",
                                 "qty": "",
@@ -910,7 +1087,7 @@ async def main():
                                 "exit_px": "",
                                 "pnl_usd": "",
                                 "pnl_r": "",
-                                "reason": "|".join(sorted(set(gates_passed))),
+                                "reason": "|".join(gp),
                                 "order_id": "",
                                 "fill_id": "",
                                 "mode": "signal_only",
@@ -920,109 +1097,64 @@ async def main():
                         # 3) Entry (signal-only) + init TP1 + JSON ENTER event
                         # ============================
                         if accepted:
-                            entry = closed["c"]
-
+                            # side from the armed direction + its gates; entry_side = 1 (LONG) / -1 (SHORT).
+                            # Whatever happens below, the setup is consumed (structure.reset()).
                             if structure.direction == "LONG" and biasLong and emaTrendLong:
-                                if structure.bosSwingLow is None:
-                                    structure.reset()
-                                else:
-                                    stop = float(structure.bosSwingLow) - (a * 0.10)
-                                    R = entry - stop
-                                    if R <= 0:
-                                        structure.reset()
-                                    else:
-                                        sig.active = True
-                                        sig.phase = "PRE_TP1"
-                                        sig.side = "LONG"
-                                        sig.trade_id = new_trade_id()
-                                        sig.entry_t = closed["t"]
-                                        sig.entry = entry
-                                        sig.stop_init = stop
-                                        sig.R = R
-                                        sig.tp1 = entry + TP1_R_MULT * R
-
-                                        safe_append({
-                                            "type": "ENTER",
-                                            "trade_id": sig.trade_id,
-                                            "side": sig.side,
-                                            "entry": sig.entry,
-                                            "stop": sig.stop_init,
-                                            "R": sig.R,
-                                            "tp1": sig.tp1,
-                                            "entry_t": sig.entry_t,
-                                            "atr": a,
-                                            "retest_buf": retest_buf,
-                                            "bos_level": structure.bosLevel,
-                                            "bos_swing_low": structure.bosSwingLow,
-                                            "ema5_fast": efast5,
-                                            "ema5_slow": eslow5,
-                                            "ema1_fast": efast1,
-                                            "ema1_slow": eslow1,
-                                            "t": closed["t"],
-                                        })
-
-                                        await notify(
-                                            f"{SYMBOL} LONG ✅ (BOS+Retest+Accept)\n"
-                                            f"entry={entry:.2f} stop={stop:.2f}\n"
-                                            f"TP1(1R)={sig.tp1:.2f}\n"
-                                            f"atr={a:.2f} retest_buf={retest_buf:.2f}\n"
-                                            f"id={sig.trade_id}"
-                                        )
-                                        structure.reset()
-
+                                entry_side, bos_swing, ev_enter = 1, structure.bosSwingLow, EV_ENTER_LONG
                             elif structure.direction == "SHORT" and biasShort and emaTrendShort:
-                                if structure.bosSwingHigh is None:
-                                    structure.reset()
-                                else:
-                                    stop = float(structure.bosSwingHigh) + (a * 0.10)
-                                    R = stop - entry
-                                    if R <= 0:
-                                        structure.reset()
-                                    else:
-                                        sig.active = True
-                                        sig.phase = "PRE_TP1"
-                                        sig.side = "SHORT"
-                                        sig.trade_id = new_trade_id()
-                                        sig.entry_t = closed["t"]
-                                        sig.entry = entry
-                                        sig.stop_init = stop
-                                        sig.R = R
-                                        sig.tp1 = entry - TP1_R_MULT * R
-
-                                        safe_append({
-                                            "type": "ENTER",
-                                            "trade_id": sig.trade_id,
-                                            "side": sig.side,
-                                            "entry": sig.entry,
-                                            "stop": sig.stop_init,
-                                            "R": sig.R,
-                                            "tp1": sig.tp1,
-                                            "entry_t": sig.entry_t,
-                                            "atr": a,
-                                            "retest_buf": retest_buf,
-                                            "bos_level": structure.bosLevel,
-                                            "bos_swing_high": structure.bosSwingHigh,
-                                            "ema5_fast": efast5,
-                                            "ema5_slow": eslow5,
-                                            "ema1_fast": efast1,
-                                            "ema1_slow": eslow1,
-                                            "t": closed["t"],
-                                        })
-
-                                        await notify(
-                                            f"{SYMBOL} SHORT ✅ (BOS+Retest+Accept)\n"
-                                            f"entry={entry:.2f} stop={stop:.2f}\n"
-                                            f"TP1(1R)={sig.tp1:.2f}\n"
-                                            f"atr={a:.2f} retest_buf={retest_buf:.2f}\n"
-                                            f"id={sig.trade_id}"
-                                        )
-                                        structure.reset()
+                                entry_side, bos_swing, ev_enter = -1, structure.bosSwingHigh, EV_ENTER_SHORT
                             else:
-                                structure.reset()
+                                entry_side, bos_swing = 0, None
+
+                            if bos_swing is not None:
+                                entry = cc
+                                stop = float(bos_swing) - entry_side * stop_pad
+                                R = entry_side * (entry - stop)
+                                if R > 0:
+                                    sig.active = True
+                                    sig.phase = "PRE_TP1"
+                                    sig.side = _SIDE_NAME[entry_side]
+                                    sig.trade_id = new_trade_id()
+                                    sig.entry_t = ct
+                                    sig.entry = entry
+                                    sig.stop_init = stop
+                                    sig.R = R
+                                    sig.tp1 = entry + entry_side * TP1_R_MULT * R
+
+                                    safe_append(
+                                        ev_enter,
+                                        sig.trade_id,
+                                        sig.side,
+                                        sig.entry,
+                                        sig.stop_init,
+                                        sig.R,
+                                        sig.tp1,
+                                        sig.entry_t,
+                                        a,
+                                        retest_buf,
+                                        structure.bosLevel,
+                                        bos_swing,
+                                        efast5,
+                                        eslow5,
+                                        efast1,
+                                        eslow1,
+                                        ct,
+                                    )
+
+                                    _defer(notify,
+                                        f"{SYMBOL} {sig.side} ✅ (BOS+Retest+Accept)\n"
+                                        f"entry={entry:.2f} stop={stop:.2f}\n"
+                                        f"TP1(1R)={sig.tp1:.2f}\n"
+                                        f"atr={a:.2f} retest_buf={retest_buf:.2f}\n"
+                                        f"id={sig.trade_id}"
+                                    )
+                            structure.reset()
 
         except Exception as e:
-            log({"event": "ws_disconnected", "error": str(e)})
-            await asyncio.sleep(5)
+            consecutive_failures += 1
+            log({"event": "ws_disconnected", "error": str(e), "consecutive_failures": consecutive_failures, "backoff_s": backoff})
+            await asyncio.sleep(backoff + random.uniform(0, backoff * 0.25))
+            backoff = min(backoff * 2, WS_BACKOFF_MAX)
 
 async def get_agent_regime_summary(symbol_data: list[dict]) -> str | None:
     """
@@ -1110,7 +1242,7 @@ async def main_intraday_swing_v2():
       - Live mode guarded by LIVE_GUARD=I_UNDERSTAND
     """
     from executor import Executor
-    from strategies.intraday_swing_v2 import candle_snapshot, decide
+    from strategies.intraday_swing_v2 import candle_snapshot, decide, ema_state
     from context_engine import build_context
     from veto_engine import evaluate_veto
     from trade_state_store import save_trade_state, load_trade_state, clear_trade_state
@@ -1165,6 +1297,8 @@ async def main_intraday_swing_v2():
         "MAX_CORR_POSITIONS": MAX_CORR_POSITIONS,
         "MAX_DAILY_DD_PCT": MAX_DAILY_DD_PCT,
     }
+    # EMA state shared by every decide() call: each new bar is one O(1) update per EMA
+    v2_emas = ema_state(params)
 
     log({"event": "startup", "symbol": SYMBOL, "strategy": "INTRADAY_SWING_V2", "mode": TRADING_MODE})
     await notify(f"✅ Intraday Swing v2 running: {SYMBOL} | mode={TRADING_MODE} | 4H/1H/5m")
@@ -1278,7 +1412,7 @@ async def main_intraday_swing_v2():
     last_runner_trail_t = 0  # last 5m candle t on which we updated trailing
 
     # Cache for manage_open_trade_fast — re-fetch at most every 5s to avoid rate-limiting
-    _c5_live_cache: list = []
+    _c5_live_cache = None  # HistArrays (candle_snapshot)
     _c5_live_cache_ts: float = 0.0
     _C5_LIVE_CACHE_TTL = 5.0  # seconds
 
@@ -1462,7 +1596,7 @@ async def main_intraday_swing_v2():
         if not c5_live:
             return False
 
-        latest = c5_live[-1]
+        latest = c5_live.bar()
         lo = latest["l"]
         hi = latest["h"]
 
@@ -1793,61 +1927,43 @@ async def main_intraday_swing_v2():
                 c1h = None
 
             if c1h and len(c1h) >= 15:
-                atr_1h = atr_from_candles(c1h, 14)
-                highs_1h = [c["h"] for c in c1h]
-                lows_1h  = [c["l"] for c in c1h]
+                highs_1h = c1h.h
+                lows_1h  = c1h.l
+                atr_1h = atr_from_candles(highs_1h, lows_1h, c1h.c, 14)
 
+                # side = 1 (LONG) / -1 (SHORT): "more protective" of a, b is side * max(side * a, side * b)
+                side = 1 if trade_side == "LONG" else -1
                 if atr_1h:
                     struct_pad_1h = STRUCT_PAD_ATR * atr_1h
-                    if trade_side == "LONG":
-                        # ATR seatbelt: trail below running highest high
-                        new_atr = runner_highest_high - RUNNER_ATR_MULT_1H * atr_1h
-                        runner_atr_stop = max(runner_atr_stop, new_atr) if runner_atr_stop is not None else new_atr
-                        # Structural: most protective 1H swing low formed since TP1
+                    # ATR seatbelt: trail off the best extreme since TP1 (highest high / lowest low)
+                    extreme = runner_highest_high if side == 1 else runner_lowest_low
+                    new_atr = extreme - side * RUNNER_ATR_MULT_1H * atr_1h
+                    runner_atr_stop = side * max(side * runner_atr_stop, side * new_atr) if runner_atr_stop is not None else new_atr
+                    # Structural: most protective 1H swing against the trade formed since TP1
+                    if side == 1:
+                        pivots_1h = lows_1h
                         pidx = last_confirmed_swing_low(lows_1h, PIVOT_1H_LEN)
-                        if pidx is not None and c1h[pidx]["t"] >= tp1_t:
-                            new_struct = lows_1h[pidx] - struct_pad_1h
-                            runner_struct_stop = max(runner_struct_stop, new_struct) if runner_struct_stop is not None else new_struct
-                    else:  # SHORT
-                        # ATR seatbelt: trail above running lowest low
-                        new_atr = runner_lowest_low + RUNNER_ATR_MULT_1H * atr_1h
-                        runner_atr_stop = min(runner_atr_stop, new_atr) if runner_atr_stop is not None else new_atr
-                        # Structural: most protective 1H swing high formed since TP1
+                    else:
+                        pivots_1h = highs_1h
                         pidx = last_confirmed_swing_high(highs_1h, PIVOT_1H_LEN)
-                        if pidx is not None and c1h[pidx]["t"] >= tp1_t:
-                            new_struct = highs_1h[pidx] + struct_pad_1h
-                            runner_struct_stop = min(runner_struct_stop, new_struct) if runner_struct_stop is not None else new_struct
+                    if pidx is not None and c1h.t[pidx] >= tp1_t:
+                        new_struct = float(pivots_1h[pidx]) - side * struct_pad_1h
+                        runner_struct_stop = side * max(side * runner_struct_stop, side * new_struct) if runner_struct_stop is not None else new_struct
 
                 # Best-of stop: most protective of BE / ATR seatbelt / structural
-                be_stop = entry_px
-                if trade_side == "LONG":
-                    new_stop = be_stop
-                    if runner_struct_stop is not None:
-                        new_stop = max(new_stop, runner_struct_stop)
-                    if runner_atr_stop is not None:
-                        new_stop = max(new_stop, runner_atr_stop)
-                    if new_stop > stop_px:
-                        log({"event": "runner_stop_raised", "symbol": SYMBOL,
-                             "trade_id": trade_id, "old_stop": stop_px, "new_stop": new_stop,
-                             "atr_stop": runner_atr_stop, "struct_stop": runner_struct_stop})
-                        stop_px = new_stop
-                        save_trade_state(SYMBOL, side=trade_side, entry_px=entry_px,
-                                         stop_px=stop_px, tp1_px=tp1_px,
-                                         trade_id=trade_id, tp1_done=True)
-                else:  # SHORT
-                    new_stop = be_stop
-                    if runner_struct_stop is not None:
-                        new_stop = min(new_stop, runner_struct_stop)
-                    if runner_atr_stop is not None:
-                        new_stop = min(new_stop, runner_atr_stop)
-                    if new_stop < stop_px:
-                        log({"event": "runner_stop_lowered", "symbol": SYMBOL,
-                             "trade_id": trade_id, "old_stop": stop_px, "new_stop": new_stop,
-                             "atr_stop": runner_atr_stop, "struct_stop": runner_struct_stop})
-                        stop_px = new_stop
-                        save_trade_state(SYMBOL, side=trade_side, entry_px=entry_px,
-                                         stop_px=stop_px, tp1_px=tp1_px,
-                                         trade_id=trade_id, tp1_done=True)
+                new_stop = entry_px
+                if runner_struct_stop is not None:
+                    new_stop = side * max(side * new_stop, side * runner_struct_stop)
+                if runner_atr_stop is not None:
+                    new_stop = side * max(side * new_stop, side * runner_atr_stop)
+                if side * new_stop > side * stop_px:
+                    log({"event": "runner_stop_raised" if side == 1 else "runner_stop_lowered", "symbol": SYMBOL,
+                         "trade_id": trade_id, "old_stop": stop_px, "new_stop": new_stop,
+                         "atr_stop": runner_atr_stop, "struct_stop": runner_struct_stop})
+                    stop_px = new_stop
+                    save_trade_state(SYMBOL, side=trade_side, entry_px=entry_px,
+                                     stop_px=stop_px, tp1_px=tp1_px,
+                                     trade_id=trade_id, tp1_done=True)
 
         return False
 
@@ -1936,11 +2052,12 @@ async def main_intraday_swing_v2():
                 await asyncio.sleep(10)
                 continue
 
-            if last_15m_t is not None and c15_probe[-1]["t"] == last_15m_t:
+            probe_t = int(c15_probe.t[-1])
+            if last_15m_t is not None and probe_t == last_15m_t:
                 await asyncio.sleep(CANDLE_PROBE_SECONDS)
                 continue
 
-            log({"event": "new_candle_detected", "symbol": SYMBOL, "t": c15_probe[-1]["t"]})
+            log({"event": "new_candle_detected", "symbol": SYMBOL, "t": probe_t})
 
             # Step 2: new candle confirmed — now fetch full history for strategy
             _fetch_jitter = random.uniform(0.5, 4.0)
@@ -1954,7 +2071,7 @@ async def main_intraday_swing_v2():
                 await asyncio.sleep(10)
                 continue
 
-            closed15 = c15[-1]
+            closed15 = c15.bar()
             last_15m_t = closed15["t"]
             print(f"INTRADAY_V2: NEW 5m candle t={closed15['t']}", flush=True)
             STATS.reset_if_new_day()
@@ -1980,7 +2097,7 @@ async def main_intraday_swing_v2():
             last_status["trade_side"] = trade_side
 
             # 3) decision
-            d = decide(params, c15, c1h, c4h)
+            d = decide(params, c15, c1h, c4h, v2_emas)
             print("INTRADAY_V2:", d.get("action"), d.get("debug"), flush=True)
             asyncio.create_task(track_adx_trend(SYMBOL, d))
             last_status["action"] = d.get("action")
@@ -1997,21 +2114,8 @@ async def main_intraday_swing_v2():
 
             symbol_atr = None
             try:
-                highs_1h = [x["h"] for x in c1h]
-                lows_1h = [x["l"] for x in c1h]
-                closes_1h = [x["c"] for x in c1h]
-
-                trs = []
-                for i in range(1, len(closes_1h)):
-                    tr = max(
-                        highs_1h[i] - lows_1h[i],
-                        abs(highs_1h[i] - closes_1h[i - 1]),
-                        abs(lows_1h[i] - closes_1h[i - 1]),
-                    )
-                    trs.append(tr)
-
-                if len(trs) >= 14:
-                    symbol_atr = sum(trs[-14:]) / 14.0
+                # ATR(14) slices the last 14 bars + one previous close itself
+                symbol_atr = atr_from_candles(c1h.h, c1h.l, c1h.c, length=14)
             except Exception:
                 pass
 
@@ -2021,12 +2125,12 @@ async def main_intraday_swing_v2():
             btc_last_close = None
 
             try:
-                c4h_closes = [x["c"] for x in c4h]
+                c4h_closes = c4h.c
                 if len(c4h_closes) >= max(EMA_FAST, EMA_SLOW) + 2:
                     btc_ema_fast = ema(c4h_closes[-(EMA_FAST * 4):], EMA_FAST)
                     btc_ema_slow = ema(c4h_closes[-(EMA_SLOW * 4):], EMA_SLOW)
-                    btc_prev_close = c4h_closes[-2]
-                    btc_last_close = c4h_closes[-1]
+                    btc_prev_close = float(c4h_closes[-2])
+                    btc_last_close = float(c4h_closes[-1])
             except Exception:
                 pass
 
@@ -2480,7 +2584,8 @@ async def main_intraday_swing_v2():
                 ctx = last_status.get("context") or {}
                 veto = last_status.get("veto") or {}
 
-                await notify(
+                # don't hold the trade-state save below behind the Telegram round trip
+                notify_bg(
                     f"{SYMBOL} {trade_side} 🟡 ENTRY ORDER SENT\n"
                     f"entry={entry_px:.2f} stop={stop_px:.2f} tp1={tp1_px:.2f}\n"
                     f"risk_usd={RISK_USDT_PER_TRADE} size≈{size:.4f}\n"
@@ -2519,21 +2624,33 @@ async def main_intraday_swing_v2():
 
 
 async def run_all():
-    tasks = []
+    # Python 3.12+: run each task's first step inline until it actually suspends
+    eager = getattr(asyncio, "eager_task_factory", None)
+    if eager is not None:
+        asyncio.get_running_loop().set_task_factory(eager)
 
-    # main trading loop
-    if STRATEGY == "INTRADAY_SWING_V2":
-        tasks.append(main_intraday_swing_v2())
-    else:
-        tasks.append(main())
+    try:
+        async with asyncio.TaskGroup() as tg:
+            # main trading loop
+            if STRATEGY == "INTRADAY_SWING_V2":
+                tg.create_task(main_intraday_swing_v2())
+            else:
+                tg.create_task(main())
+
+            # heartbeat always on (or gate it with env if you want)
+            # tg.create_task(heartbeat_loop())
 
-    # heartbeat always on (or gate it with env if you want)
-    # tasks.append(heartbeat_loop())
+            # telegram control polling (optional)
+            if os.getenv("TELEGRAM_CONTROL", "0") == "1":
+                tg.create_task(telegram_poll_commands(handle_command))
+    finally:
+        if STRATEGY == "INTRADAY_SWING_V2":
+            from strategies.intraday_swing_v2 import aclose_client
+            await aclose_client()
+        await aclose_notify_client()
 
-    # telegram control polling (optional)
-    if os.getenv("TELEGRAM_CONTROL", "0") == "1":
-        tasks.append(telegram_poll_commands(handle_command))
 
-    await asyncio.gather(*tasks)
 if __name__ == "__main__":
+    _uvloop.install()
+    _shutdown.install()
     asyncio.run(run_all())
@@ -1,7 +1,11 @@
 import time
 import httpx
+import numpy as np
 
-from indicators import ema
+from _fastjson import loads as json_loads
+from _njit import njit
+from candles import atr_from_candles, hist_from_snapshot
+from indicators import ema, EmaTracker
 from pivots import last_confirmed_swing_high, last_confirmed_swing_low
 
 
@@ -9,51 +13,60 @@ from pivots import last_confirmed_swing_high, last_confirmed_swing_low
 # Indicators
 # =========================================================
 
-def rsi(closes, length=14):
-    if len(closes) < length + 1:
-        return None
-
+@njit(cache=True)
+def _rsi_sum(closes, length):
+    # plain gain/loss sums over the last `length` changes (not Wilder-smoothed)
+    n = len(closes)
     gains = 0.0
     losses = 0.0
-
-    for i in range(-length, 0):
+    for i in range(n - length, n):
         diff = closes[i] - closes[i - 1]
         if diff >= 0:
             gains += diff
         else:
-            losses += -diff
+            losses -= diff
 
     if losses == 0:
         return 100.0
+    return 100.0 - 100.0 / (1.0 + gains / losses)
+
 
-    rs = gains / losses
-    return 100 - (100 / (1 + rs))
+def rsi(closes, length=14):
+    if len(closes) < length + 1:
+        return None
+    return float(_rsi_sum(np.asarray(closes[-(length + 1):], dtype=np.float64), length))
 
 
 def atr(candles, length=14):
-    if len(candles) < length + 1:
-        return None
+    # simple mean of the last `length` true ranges, as one vectorized max over the tail
+    return atr_from_candles(candles.h, candles.l, candles.c, length)
 
-    trs = []
 
-    for i in range(-length, 0):
-        c = candles[i]
-        p = candles[i - 1]
+# =========================================================
+# Hyperliquid Candle Snapshot
+# =========================================================
 
-        tr = max(
-            c["h"] - c["l"],
-            abs(c["h"] - p["c"]),
-            abs(c["l"] - p["c"]),
-        )
+# candleSnapshot interval names for the non-minute timeframes; anything else is "<n>m"
+_TF_LABEL = {900: "15m", 3600: "1h", 14400: "4h"}
 
-        trs.append(tr)
+# One pooled client for every snapshot: the V2 loop polls several times a minute,
+# so keep-alive saves a TCP+TLS handshake per request.
+_client: httpx.AsyncClient | None = None
 
-    return sum(trs) / len(trs)
 
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_keepalive_connections=8))
+    return _client
+
+
+async def aclose_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
-# =========================================================
-# Hyperliquid Candle Snapshot
-# =========================================================
 
 async def candle_snapshot(symbol: str, tf_sec: int, limit: int = 250):
     url = "https://api.hyperliquid.xyz/info"
@@ -61,14 +74,7 @@ async def candle_snapshot(symbol: str, tf_sec: int, limit: int = 250):
     now = int(time.time() * 1000)
     start = now - (limit * tf_sec * 1000)
 
-    if tf_sec == 900:
-        interval = "15m"
-    elif tf_sec == 3600:
-        interval = "1h"
-    elif tf_sec == 14400:
-        interval = "4h"
-    else:
-        interval = f"{tf_sec // 60}m"
+    interval = _TF_LABEL.get(tf_sec) or f"{tf_sec // 60}m"
 
     payload = {
         "type": "candleSnapshot",
@@ -80,55 +86,66 @@ async def candle_snapshot(symbol: str, tf_sec: int, limit: int = 250):
         },
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(url, json=payload)
-        r.raise_for_status()
-        data = r.json()
-
-    out = []
-
-    for c in data:
-        t = int(c["t"] / 1000)
-        out.append({
-            "t": t - (t % tf_sec),
-            "o": float(c["o"]),
-            "h": float(c["h"]),
-            "l": float(c["l"]),
-            "c": float(c["c"]),
-        })
+    r = await _get_client().post(url, json=payload)
+    r.raise_for_status()
+    data = json_loads(r.content)
 
-    return out
+    return hist_from_snapshot(data, tf_sec)
 
 
 # =========================================================
 # Decision Engine
 # =========================================================
 
-def decide(params, c15, c1h, c4h):
+def ema_state(params):
+    """EMA trackers decide() carries across calls, keyed by (tf, length)."""
+    # seeded from the whole closed part of the first snapshot, like ema(candles.c)
+    return {
+        (tf, n): EmaTracker(n, seed_bars=0)
+        for tf in ("15m", "1h", "4h")
+        for n in (params["EMA_FAST"], params["EMA_SLOW"])
+    }
+
+
+def _ema(emas, tf, candles, length):
+    if emas is None:
+        return ema(candles.c, length)
+    # snapshots run up to now, so the last row is the bar still forming: only closed
+    # bars go into the tracker, the live one is applied as a one-step preview that
+    # is recomputed (not stored) on every call
+    tracker = emas[(tf, length)]
+    v = tracker.advance(candles.t[:-1], candles.c[:-1])
+    if v is None:
+        return None
+    return v + tracker.k * (float(candles.c[-1]) - v)
+
+
+def decide(params, c15, c1h, c4h, emas=None):
     if len(c15) < 80 or len(c1h) < 80 or len(c4h) < 80:
         return {"action": "NO_TRADE", "reason": "not_enough_data"}
 
-    closes15 = [c["c"] for c in c15]
-    closes1  = [c["c"] for c in c1h]
-    closes4  = [c["c"] for c in c4h]
+    closes15 = c15.c
+    closes1  = c1h.c
+    closes4  = c4h.c
 
-    ema9_15  = ema(closes15, params["EMA_FAST"])
-    ema21_15 = ema(closes15, params["EMA_SLOW"])
-    ema9_1h  = ema(closes1, params["EMA_FAST"])
-    ema21_1h = ema(closes1, params["EMA_SLOW"])
-    ema9_4h  = ema(closes4, params["EMA_FAST"])
-    ema21_4h = ema(closes4, params["EMA_SLOW"])
+    ema9_15  = _ema(emas, "15m", c15, params["EMA_FAST"])
+    ema21_15 = _ema(emas, "15m", c15, params["EMA_SLOW"])
+    ema9_1h  = _ema(emas, "1h", c1h, params["EMA_FAST"])
+    ema21_1h = _ema(emas, "1h", c1h, params["EMA_SLOW"])
+    ema9_4h  = _ema(emas, "4h", c4h, params["EMA_FAST"])
+    ema21_4h = _ema(emas, "4h", c4h, params["EMA_SLOW"])
 
     if None in (ema9_15, ema21_15, ema9_1h, ema21_1h, ema9_4h, ema21_4h):
         return {"action": "NO_TRADE", "reason": "ema_na"}
 
     # 4H Bias
-    biasBull = ema9_4h > ema21_4h and closes4[-1] > ema9_4h
-    biasBear = ema9_4h < ema21_4h and closes4[-1] < ema9_4h
+    close4 = float(closes4[-1])
+    biasBull = ema9_4h > ema21_4h and close4 > ema9_4h
+    biasBear = ema9_4h < ema21_4h and close4 < ema9_4h
 
     # 1H Structure
-    highs1 = [c["h"] for c in c1h]
-    lows1  = [c["l"] for c in c1h]
+    highs1 = c1h.h
+    lows1  = c1h.l
 
     idx_hi = last_confirmed_swing_high(highs1, params["PIVOT_1H_LEN"])
     idx_lo = last_confirmed_swing_low(lows1, params["PIVOT_1H_LEN"])
@@ -136,11 +153,11 @@ def decide(params, c15, c1h, c4h):
     if idx_hi is None or idx_lo is None:
         return {"action": "NO_TRADE", "reason": "no_pivots"}
 
-    lastHigh = highs1[idx_hi]
-    lastLow  = lows1[idx_lo]
+    lastHigh = float(highs1[idx_hi])
+    lastLow  = float(lows1[idx_lo])
 
-    prev1 = closes1[-2]
-    cur1  = closes1[-1]
+    prev1 = float(closes1[-2])
+    cur1  = float(closes1[-1])
 
     bosUp   = prev1 <= lastHigh and cur1 > lastHigh
     bosDown = prev1 >= lastLow  and cur1 < lastLow
@@ -155,7 +172,7 @@ def decide(params, c15, c1h, c4h):
     shortConfirm = bosDown and acceptShort
 
     # 15m Reclaim
-    close15 = closes15[-1]
+    close15 = float(closes15[-1])
     reclaimLong  = close15 > ema9_15 and ema9_15 > ema21_15
     reclaimShort = close15 < ema9_15 and ema9_15 < ema21_15
 
@@ -1,6 +1,12 @@
 from dataclasses import dataclass
 from typing import Dict, Optional, Tuple, Any
 
+import numpy as np
+
+from _njit import njit
+from candles import atr_from_candles
+from indicators import emas, EmaTracker
+
 
 @dataclass
 class SwingSignal:
@@ -12,66 +18,137 @@ class SwingSignal:
     reason: str
 
 
-def ema(values, length: int):
-    if not values or len(values) < length:
-        return None
-    k = 2 / (length + 1)
-    e = values[0]
-    for v in values[1:]:
-        e = v * k + e * (1 - k)
-    return e
+@njit(cache=True)
+def _pivot_high_idx(high, left, right):
+    # newest first: x[i] > each of the `left` bars before it and >= each of the `right` after
+    n = len(high)
+    for i in range(n - right - 1, left, -1):
+        h = high[i]
+        ok = True
+        for j in range(1, left + 1):
+            if not h > high[i - j]:
+                ok = False
+                break
+        if ok:
+            for j in range(1, right + 1):
+                if not h >= high[i + j]:
+                    ok = False
+                    break
+        if ok:
+            return i
+    return -1
 
 
-def atr(high, low, close, length: int = 14):
-    if len(close) < length + 1:
-        return None
-    trs = []
-    for i in range(1, len(close)):
-        tr = max(
-            high[i] - low[i],
-            abs(high[i] - close[i - 1]),
-            abs(low[i] - close[i - 1]),
-        )
-        trs.append(tr)
-    if len(trs) < length:
-        return None
-    return sum(trs[-length:]) / length
+@njit(cache=True)
+def _pivot_low_idx(low, left, right):
+    n = len(low)
+    for i in range(n - right - 1, left, -1):
+        l = low[i]
+        ok = True
+        for j in range(1, left + 1):
+            if not l < low[i - j]:
+                ok = False
+                break
+        if ok:
+            for j in range(1, right + 1):
+                if not l <= low[i + j]:
+                    ok = False
+                    break
+        if ok:
+            return i
+    return -1
 
 
 def pivot_high(high, left=5, right=5):
     """Return index of last confirmed pivot high."""
-    n = len(high)
-    if n < left + right + 1:
+    if len(high) < left + right + 1:
         return None
-    for i in range(n - right - 1, left, -1):
-        h = high[i]
-        if all(h > high[i - j] for j in range(1, left + 1)) and all(
-            h >= high[i + j] for j in range(1, right + 1)
-        ):
-            return i
-    return None
+    i = _pivot_high_idx(np.asarray(high, dtype=np.float64), left, right)
+    return int(i) if i >= 0 else None
 
 
 def pivot_low(low, left=5, right=5):
     """Return index of last confirmed pivot low."""
-    n = len(low)
-    if n < left + right + 1:
+    if len(low) < left + right + 1:
         return None
-    for i in range(n - right - 1, left, -1):
-        l = low[i]
-        if all(l < low[i - j] for j in range(1, left + 1)) and all(
-            l <= low[i + j] for j in range(1, right + 1)
-        ):
-            return i
-    return None
+    i = _pivot_low_idx(np.asarray(low, dtype=np.float64), left, right)
+    return int(i) if i >= 0 else None
+
 
+def _refresh_pivots(c1h: Dict[str, list], pivot_len: int, state: Dict[str, Any]) -> None:
+    """
+    Keep state["last_ph"] / state["last_pl"] at the newest confirmed pivot values.
 
-def bias_4h(c4h) -> str:
+    Bars confirmed before the last call can't change, so only the bars confirmed
+    since then are scanned. A full scan runs on the first call and whenever the
+    history was trimmed (fewer bars, or a different first bar: its "time" when the
+    caller provides one, else its high/low).
+    """
+    high, low = c1h["high"], c1h["low"]
+    n = len(high)
+    times = c1h.get("time")
+    if not n:
+        anchor = None
+    elif times is not None and len(times):
+        anchor = int(times[0])
+    else:
+        anchor = (high[0], low[0])
+    n0 = state.get("pivot_n")
+    if n0 is None or n < n0 or state.get("pivot_anchor") != anchor:
+        ph_i = pivot_high(high, pivot_len, pivot_len)
+        pl_i = pivot_low(low, pivot_len, pivot_len)
+        state["last_ph"] = None if ph_i is None else high[ph_i]
+        state["last_pl"] = None if pl_i is None else low[pl_i]
+    elif n > n0:
+        # newly confirmable pivots are n0-L .. n-L-1; the slice starts L+1 bars
+        # earlier so the kernels' own left-window bound lines up
+        lo = max(n0 - pivot_len, pivot_len + 1)
+        if lo <= n - pivot_len - 1:
+            s = lo - pivot_len - 1
+            ph_i = pivot_high(high[s:], pivot_len, pivot_len)
+            pl_i = pivot_low(low[s:], pivot_len, pivot_len)
+            if ph_i is not None:
+                state["last_ph"] = high[s + ph_i]
+            if pl_i is not None:
+                state["last_pl"] = low[s + pl_i]
+    state["pivot_n"] = n
+    state["pivot_anchor"] = anchor
+
+
+def _atr_1h(c1h, atr_len: int, state: Dict[str, Any]) -> Optional[float]:
+    """
+    ATR over the last `atr_len` 1H bars, recomputed only when a new 1H bar has
+    closed (keyed on its "time"); trims at the front can't change it unless they
+    leave too few bars.
+    """
+    times = c1h.get("time")
+    if times is None or not len(times):
+        return atr_from_candles(c1h["high"], c1h["low"], c1h["close"], atr_len)
+    key = (int(times[-1]), atr_len, len(times) > atr_len)
+    if state.get("atr_key") != key:
+        state["atr_1h"] = atr_from_candles(c1h["high"], c1h["low"], c1h["close"], atr_len)
+        state["atr_key"] = key
+    return state["atr_1h"]
+
+
+def bias_4h(c4h, state: Optional[Dict[str, Any]] = None) -> str:
+    """
+    4H trend bias from EMA9/EMA21. With `state` and a "time" column the EMAs are
+    carried in state["ema4h"] and only newly closed 4H bars are folded in.
+    """
     c = c4h["close"]
     if len(c) < 30:
         return "NEUTRAL"
-    e9 = ema(c[-60:], 9)
-    e21 = ema(c[-60:], 21)
+    times = c4h.get("time")
+    if state is not None and times is not None:
+        trackers = state.get("ema4h")
+        if trackers is None:
+            # seeded from the same last-60-closes window the stateless path uses
+            trackers = state["ema4h"] = (EmaTracker(9, seed_bars=60), EmaTracker(21, seed_bars=60))
+        e9 = trackers[0].advance(times, c)
+        e21 = trackers[1].advance(times, c)
+    else:
+        e9, e21 = emas(c[-60:], (9, 21))
     if e9 is None or e21 is None:
         return "NEUTRAL"
     if e9 > e21 and c[-1] > e21:
@@ -92,9 +169,9 @@ def generate_swing_signal(
     atr_buf_mult: float = 0.25,
     tp_r: float = 1.0,
     accept_bars: int = 2,
-) -> Tuple[Optional[SwingSignal], Dict[str, Any], Dict[str, Any]]:
+) -> Tuple[Optional[SwingSignal], Dict[str, Any]]:
     """
-    Returns: (signal_or_None, updated_state, debug)
+    Returns: (signal_or_None, debug). `state` is updated in place.
     state keys used:
       phase: IDLE|ARMED|RETEST|IN_TRADE
       side: LONG|SHORT
@@ -103,35 +180,36 @@ def generate_swing_signal(
       stop: float
       tp1: float
       tp1_hit: bool
+      last_ph / last_pl: newest confirmed 1H pivot values (+ pivot_n, pivot_anchor)
+      ema4h: 4H EMA9/EMA21 trackers (see bias_4h)
+      atr_1h / atr_key: 1H ATR as of the newest 1H bar
     """
 
     debug = {"symbol": symbol}
-    updated = dict(state or {})
-    phase = updated.get("phase", "IDLE")
+    phase = state.get("phase", "IDLE")
 
     # ---- Bias filter (4H) ----
-    bias = bias_4h(c4h)
+    bias = bias_4h(c4h, state)
     debug["bias_4h"] = bias
     if bias == "NEUTRAL":
-        updated["phase"] = "IDLE"
-        return None, updated, debug
+        state["phase"] = "IDLE"
+        return None, debug
 
     # ---- ATR (1H) ----
-    a1h = atr(c1h["high"], c1h["low"], c1h["close"], atr_len)
+    a1h = _atr_1h(c1h, atr_len, state)
     debug["atr_1h"] = a1h
     if a1h is None:
-        return None, updated, debug
+        return None, debug
     buf = a1h * atr_buf_mult
     debug["buf"] = buf
 
     # ---- Pivots (1H) ----
-    ph_i = pivot_high(c1h["high"], pivot_len, pivot_len)
-    pl_i = pivot_low(c1h["low"], pivot_len, pivot_len)
-    if ph_i is None or pl_i is None:
-        return None, updated, debug
+    _refresh_pivots(c1h, pivot_len, state)
+    swing_high = state["last_ph"]
+    swing_low = state["last_pl"]
+    if swing_high is None or swing_low is None:
+        return None, debug
 
-    swing_high = c1h["high"][ph_i]
-    swing_low = c1h["low"][pl_i]
     debug["swing_high"] = swing_high
     debug["swing_low"] = swing_low
 
@@ -140,12 +218,12 @@ def generate_swing_signal(
 
     # ---- Manage active trade (runner logic later in swingbot) ----
     if phase == "IN_TRADE":
-        return None, updated, debug
+        return None, debug
 
     # ---- Phase: IDLE -> ARM on BOS ----
     if phase == "IDLE":
         if bias == "LONG" and last_1h_close > swing_high:
-            updated.update(
+            state.update(
                 {
                     "phase": "ARMED",
                     "side": "LONG",
@@ -154,10 +232,10 @@ def generate_swing_signal(
                 }
             )
             debug["event"] = "BOS_LONG_ARMED"
-            return None, updated, debug
+            return None, debug
 
         if bias == "SHORT" and last_1h_close < swing_low:
-            updated.update(
+            state.update(
                 {
                     "phase": "ARMED",
                     "side": "SHORT",
@@ -166,14 +244,14 @@ def generate_swing_signal(
                 }
             )
             debug["event"] = "BOS_SHORT_ARMED"
-            return None, updated, debug
+            return None, debug
 
-        return None, updated, debug
+        return None, debug
 
     # ---- Phase: ARMED -> wait for retest into zone ----
     if phase == "ARMED":
-        side = updated.get("side")
-        bos_level = float(updated.get("bos_level"))
+        side = state.get("side")
+        bos_level = float(state.get("bos_level"))
 
         last_15_close = c15m["close"][-1]
         debug["last_15_close"] = last_15_close
@@ -183,44 +261,41 @@ def generate_swing_signal(
             in_zone = (bos_level - buf) <= last_15_close <= (bos_level + buf)
             debug["retest_in_zone"] = in_zone
             if in_zone:
-                updated["phase"] = "RETEST"
-                updated["retest_level"] = bos_level
-                updated["accept_count"] = 0
-            return None, updated, debug
+                state["phase"] = "RETEST"
+                state["retest_level"] = bos_level
+                state["accept_count"] = 0
+            return None, debug
 
         if side == "SHORT":
             in_zone = (bos_level - buf) <= last_15_close <= (bos_level + buf)
             debug["retest_in_zone"] = in_zone
             if in_zone:
-                updated["phase"] = "RETEST"
-                updated["retest_level"] = bos_level
-                updated["accept_count"] = 0
-            return None, updated, debug
+                state["phase"] = "RETEST"
+                state["retest_level"] = bos_level
+                state["accept_count"] = 0
+            return None, debug
 
         # fallback
-        updated["phase"] = "IDLE"
-        return None, updated, debug
+        state["phase"] = "IDLE"
+        return None, debug
 
     # ---- Phase: RETEST -> acceptance on 15m closes ----
     if phase == "RETEST":
-        side = updated.get("side")
-        lvl = float(updated.get("retest_level"))
-        accept = int(updated.get("accept_count", 0))
+        side = state.get("side")
+        lvl = float(state.get("retest_level"))
+        accept = int(state.get("accept_count", 0))
 
         closes = c15m["close"]
         if len(closes) < accept_bars:
-            return None, updated, debug
+            return None, debug
 
         last_close = closes[-1]
         debug["last_15_close"] = last_close
 
         if side == "LONG":
             # acceptance = consecutive closes above lvl + buffer
-            if last_close > (lvl + buf):
-                accept += 1
-            else:
-                accept = 0
-            updated["accept_count"] = accept
+            accept = accept + 1 if last_close > (lvl + buf) else 0
+            state["accept_count"] = accept
             debug["accept_count"] = accept
 
             if accept >= accept_bars:
@@ -228,11 +303,11 @@ def generate_swing_signal(
                 stop = (lvl - buf)  # below retest zone
                 risk = entry - stop
                 if risk <= 0:
-                    updated["phase"] = "IDLE"
-                    return None, updated, debug
+                    state["phase"] = "IDLE"
+                    return None, debug
                 tp1 = entry + (risk * tp_r)
 
-                updated.update(
+                state.update(
                     {
                         "phase": "IN_TRADE",
                         "entry": entry,
@@ -249,16 +324,13 @@ def generate_swing_signal(
                     tp1=tp1,
                     reason="4H bias LONG + 1H BOS + retest + 15m acceptance",
                 )
-                return sig, updated, debug
+                return sig, debug
 
-            return None, updated, debug
+            return None, debug
 
         if side == "SHORT":
-            if last_close < (lvl - buf):
-                accept += 1
-            else:
-                accept = 0
-            updated["accept_count"] = accept
+            accept = accept + 1 if last_close < (lvl - buf) else 0
+            state["accept_count"] = accept
             debug["accept_count"] = accept
 
             if accept >= accept_bars:
@@ -266,11 +338,11 @@ def generate_swing_signal(
                 stop = (lvl + buf)
                 risk = stop - entry
                 if risk <= 0:
-                    updated["phase"] = "IDLE"
-                    return None, updated, debug
+                    state["phase"] = "IDLE"
+                    return None, debug
                 tp1 = entry - (risk * tp_r)
 
-                updated.update(
+                state.update(
                     {
                         "phase": "IN_TRADE",
                         "entry": entry,
@@ -287,13 +359,13 @@ def generate_swing_signal(
                     tp1=tp1,
                     reason="4H bias SHORT + 1H BOS + retest + 15m acceptance",
                 )
-                return sig, updated, debug
+                return sig, debug
 
-            return None, updated, debug
+            return None, debug
 
-        updated["phase"] = "IDLE"
-        return None, updated, debug
+        state["phase"] = "IDLE"
+        return None, debug
 
     # fallback
-    updated["phase"] = "IDLE"
-    return None, updated, debug
+    state["phase"] = "IDLE"
+    return None, debug
@@ -1,16 +1,20 @@
 import asyncio
-import json
 import os
 import time
 from typing import Any, Dict, Optional, Tuple
 
 import httpx
+import numpy as np
 import websockets
 
+from _fastjson import dumps as json_dumps
+import _uvloop
+from candles import NS, HistArrays, hist_from_snapshot
 from config import ENV, WS_URL
 from logger import log
 from notifier import notify
 from strategies.swing_strategy import generate_swing_signal
+from ws_feed import FrameBatch, all_mids_price, mid_needle
 
 SYMBOL = os.getenv("SYMBOL", "BTC")
 
@@ -19,45 +23,135 @@ BOOTSTRAP_DAYS = int(os.getenv("SWING_BOOTSTRAP_DAYS", "5"))
 STATUS_EVERY_N_15M = int(os.getenv("SWING_STATUS_EVERY_N_15M", "4"))
 
 
+# Closed 5m candles kept in memory (7 days). Trimmed in whole 4h groups so the
+# 15m/1h/4h aggregation in aggregate_from_5m keeps the same bar boundaries.
+MAX_5M_CANDLES = int(os.getenv("SWING_MAX_5M_CANDLES", "2016"))
+TRIM_MULTIPLE = 48
+
+
 class CandleBuilder:
-    def __init__(self, tf_seconds: int):
-        self.tf = tf_seconds
-        self.current = None
-        self.candles = []
-
-    def _bucket(self, ts: float) -> int:
-        return int(ts // self.tf) * self.tf
-
-    def update(self, ts: float, price: float):
-        b = self._bucket(ts)
-        if self.current is None or self.current["t"] != b:
-            if self.current is not None:
-                self.candles.append(self.current)
-            self.current = {"t": b, "o": price, "h": price, "l": price, "c": price}
-        else:
-            self.current["h"] = max(self.current["h"], price)
-            self.current["l"] = min(self.current["l"], price)
-            self.current["c"] = price
-
-
-def aggregate_from_5m(c5m: list, group_n: int) -> Dict[str, list]:
-    out = {"open": [], "high": [], "low": [], "close": []}
-    total = len(c5m)
-    usable = (total // group_n) * group_n
+    """
+    5m bars for the swing loop.
+
+    Closed bars live column-wise in preallocated arrays (first `n` slots valid);
+    the open bar is kept as plain scalars. Trimming shifts the newest bars to the
+    front in whole `trim_multiple` groups.
+    """
+    def __init__(self, tf_seconds: int, max_candles: int = MAX_5M_CANDLES, trim_multiple: int = TRIM_MULTIPLE):
+        self.tf = int(tf_seconds)
+        self.max_candles = max_candles
+        self.trim_multiple = trim_multiple
+        cap = max_candles + 1
+        self.t = np.empty(cap, dtype=np.int64)
+        self.o = np.empty(cap, dtype=np.float64)
+        self.h = np.empty(cap, dtype=np.float64)
+        self.l = np.empty(cap, dtype=np.float64)
+        self.c = np.empty(cap, dtype=np.float64)
+        self.n = 0
+        self.cur_t = None  # bucket start of the open bar; None before the first tick
+        self.cur_o = self.cur_h = self.cur_l = self.cur_c = 0.0
+
+    def __len__(self):
+        return self.n
+
+    def _cols(self):
+        return (self.t, self.o, self.h, self.l, self.c)
+
+    def _trim(self):
+        drop = self.n - self.max_candles
+        if drop > 0:
+            drop += -drop % self.trim_multiple
+            keep = self.n - drop
+            for col in self._cols():
+                col[:keep] = col[drop:self.n]
+            self.n = keep
+
+    def bucket(self, ts: float) -> int:
+        """Start (seconds) of the bar `ts` falls in."""
+        its = int(ts)
+        return its - its % self.tf
+
+    def closed(self) -> HistArrays:
+        """Closed bars as column views; only valid until the next update."""
+        n = self.n
+        return HistArrays(self.t[:n], self.o[:n], self.h[:n], self.l[:n], self.c[:n])
+
+    def extend(self, hist: HistArrays):
+        """Append already-closed bars (bootstrap), trimming like update() would."""
+        cols = [np.concatenate((mine[:self.n], theirs)) for mine, theirs in zip(self._cols(), (hist.t, hist.o, hist.h, hist.l, hist.c))]
+        m = len(cols[0])
+        drop = m - self.max_candles
+        drop = drop + -drop % self.trim_multiple if drop > 0 else 0
+        self.n = m - drop
+        for mine, col in zip(self._cols(), cols):
+            mine[:self.n] = col[drop:]
+
+    def update(self, ts: float, price: float) -> bool:
+        """Fold one tick in; True when it closed the previous bar."""
+        b = self.bucket(ts)
+        if b != self.cur_t:
+            closed = self.cur_t is not None
+            if closed:
+                i = self.n
+                self.t[i], self.o[i], self.h[i], self.l[i], self.c[i] = (
+                    self.cur_t, self.cur_o, self.cur_h, self.cur_l, self.cur_c)
+                self.n = i + 1
+                self._trim()
+            self.cur_t = b
+            self.cur_o = self.cur_h = self.cur_l = self.cur_c = price
+            return closed
+        if price > self.cur_h:
+            self.cur_h = price
+        if price < self.cur_l:
+            self.cur_l = price
+        self.cur_c = price
+        return False
+
+
+def _empty_agg() -> Dict[str, np.ndarray]:
+    empty = np.empty(0, dtype=np.float64)
+    return {"time": np.empty(0, dtype=np.int64), "open": empty, "high": empty, "low": empty, "close": empty}
+
+
+def aggregate_from_5m(c5m: HistArrays, group_n: int) -> Dict[str, np.ndarray]:
+    """
+    Whole groups of `group_n` consecutive 5m bars -> higher-TF columns (arrays),
+    via reduceat over the group starts.
+    """
+    usable = (len(c5m) // group_n) * group_n
     if usable < group_n:
-        return out
+        return _empty_agg()
+
+    idx = np.arange(0, usable, group_n)
+    return {
+        "time": c5m.t[idx],
+        "open": c5m.o[idx],
+        "high": np.maximum.reduceat(c5m.h[:usable], idx),
+        "low": np.minimum.reduceat(c5m.l[:usable], idx),
+        "close": c5m.c[idx + group_n - 1],
+    }
 
-    for i in range(0, usable, group_n):
-        chunk = c5m[i : i + group_n]
-        out["open"].append(chunk[0]["o"])
-        out["close"].append(chunk[-1]["c"])
-        out["high"].append(max(x["h"] for x in chunk))
-        out["low"].append(min(x["l"] for x in chunk))
 
-    return out
+def rollup(agg: Dict[str, np.ndarray], group_n: int) -> Dict[str, np.ndarray]:
+    """
+    Aggregate an already-aggregated column dict again (15m -> 1h -> 4h), so each
+    timeframe reads the one below it instead of the full 5m history.
+    """
+    usable = (len(agg["close"]) // group_n) * group_n
+    if usable < group_n:
+        return _empty_agg()
+
+    idx = np.arange(0, usable, group_n)
+    return {
+        "time": agg["time"][idx],
+        "open": agg["open"][idx],
+        "high": np.maximum.reduceat(agg["high"][:usable], idx),
+        "low": np.minimum.reduceat(agg["low"][:usable], idx),
+        "close": agg["close"][idx + group_n - 1],
+    }
 
 
-async def bootstrap_5m_candles(symbol: str, limit_days: int = 5) -> list:
+async def bootstrap_5m_candles(symbol: str, limit_days: int = 5) -> HistArrays:
     end_ms = int(time.time() * 1000)
     start_ms = end_ms - (limit_days * 24 * 60 * 60 * 1000)
 
@@ -76,32 +170,11 @@ async def bootstrap_5m_candles(symbol: str, limit_days: int = 5) -> list:
         r.raise_for_status()
         data = r.json()
 
-    candles = []
-    if isinstance(data, list):
-        for x in data:
-            try:
-                t = int(x["t"]) // 1000
-                candles.append(
-                    {
-                        "t": t,
-                        "o": float(x["o"]),
-                        "h": float(x["h"]),
-                        "l": float(x["l"]),
-                        "c": float(x["c"]),
-                    }
-                )
-            except Exception:
-                continue
-
-    candles.sort(key=lambda d: d["t"])
-    return candles
-
-
-def _unpack_strategy_result(result: Any):
-    if isinstance(result, tuple) and len(result) == 3:
-        sig, state, dbg = result
-        return sig, (state or {}), (dbg or {})
-    return result, {}, {}
+    hist = hist_from_snapshot(data if isinstance(data, list) else [], TF_5M)
+    if len(hist) > 1 and np.any(hist.t[1:] < hist.t[:-1]):
+        order = np.argsort(hist.t, kind="stable")
+        hist = HistArrays(hist.t[order], hist.o[order], hist.h[order], hist.l[order], hist.c[order])
+    return hist
 
 
 async def swing_loop():
@@ -118,13 +191,15 @@ async def swing_loop():
     state: Dict[str, Any] = {"phase": "IDLE"}
     last_phase = state.get("phase")
     last_signal_key = None
-    last_15m_close_count = 0
+    last_15m_t = None  # start of the newest 15m bar the strategy has seen
+    c1h = c4h = None
+    c1h_key = c4h_key = None  # (first 5m bar, newest complete group start) each was built from
     last_status_15m = 0
 
     # Bootstrap history
     try:
         hist = await bootstrap_5m_candles(SYMBOL, limit_days=BOOTSTRAP_DAYS)
-        cb5.candles.extend(hist)
+        cb5.extend(hist)
         msg = f"[SWING] Bootstrapped {SYMBOL}: {len(hist)} x 5m candles (~{BOOTSTRAP_DAYS}d)"
         print(msg)
         await notify(msg)
@@ -138,73 +213,85 @@ async def swing_loop():
                 WS_URL,
                 ping_interval=20,
                 ping_timeout=20,
+                compression=None,
+                max_queue=32,
+                max_size=2**22,
             ) as ws:
                 print(f"[SWING] ws connected {WS_URL}")
 
                 sub = {"method": "subscribe", "subscription": {"type": "allMids"}}
-                await ws.send(json.dumps(sub))
+                await ws.send(json_dumps(sub).decode())
                 print("[SWING] ws subscribed")
+                needle = mid_needle(SYMBOL)
+                last_price_b = None
+                feed = FrameBatch(ws)
 
                 while True:
-                    msg = await ws.recv()
-
-                    try:
-                        data = json.loads(msg)
-                    except Exception:
-                        continue
-
-                    if data.get("channel") != "allMids":
-                        continue
-
-                    mids = data.get("data", {}).get("mids")
-                    if not isinstance(mids, dict):
-                        continue
-
-                    if SYMBOL not in mids:
-                        continue
-
-                    try:
-                        price = float(mids[SYMBOL])
-                    except Exception:
-                        continue
-
-                    cb5.update(time.time(), price)
-
-                    if len(cb5.candles) < 96:
+                    # every mid in the batch is folded into the open bar (keeps true h/l);
+                    # the bar logic below runs once per batch
+                    batch = await feed.get_batch()
+                    closed_any = False
+                    for ts_ns, msg in batch:
+                        # only SYMBOL's mid is needed: slice it out instead of parsing every coin
+                        price_b = all_mids_price(msg, needle)
+                        if price_b is None:
+                            continue
+                        ts = ts_ns // NS
+                        # a repeated print inside the open bar can't change it
+                        if price_b == last_price_b and cb5.bucket(ts) == cb5.cur_t:
+                            continue
+                        try:
+                            price = float(price_b)
+                        except ValueError:
+                            continue
+                        last_price_b = price_b
+                        if cb5.update(ts, price):
+                            closed_any = True
+
+                    # closed bars only change when a 5m bar closes, and a new 15m
+                    # bar only appears when that completes a group of 3: after the first
+                    # evaluation (bootstrapped history) everything below runs at
+                    # most once per 15m
+                    if not closed_any and (last_15m_t is not None or cb5.cur_t is None):
                         continue
 
-                    c15 = aggregate_from_5m(cb5.candles, 3)
-                    if not c15["close"]:
+                    if len(cb5) < 96:
                         continue
 
-                    if len(c15["close"]) == last_15m_close_count:
+                    # keyed on the bar's start, not the 15m count: a trim shrinks the
+                    # count without closing a new 15m bar
+                    n15 = len(cb5) // 3
+                    t15 = int(cb5.t[n15 * 3 - 3])
+                    if t15 == last_15m_t:
                         continue
-                    last_15m_close_count = len(c15["close"])
-
-                    c1h = aggregate_from_5m(cb5.candles, 12)
-                    c4h = aggregate_from_5m(cb5.candles, 48)
-                    if not c1h["close"] or not c4h["close"]:
+                    last_15m_t = t15
+
+                    c5 = cb5.closed()
+                    c15 = aggregate_from_5m(c5, 3)
+
+                    # 1h/4h only change when a 12/48 group completes (or a trim moves
+                    # the first bar): reuse the last build until then
+                    n5 = len(cb5)
+                    t0 = int(cb5.t[0])
+                    key = (t0, int(cb5.t[n5 // 12 * 12 - 12]))
+                    if key != c1h_key:
+                        c1h_key = key
+                        c1h = rollup(c15, 4)
+                    key = (t0, int(cb5.t[n5 // 48 * 48 - 48]))
+                    if key != c4h_key:
+                        c4h_key = key
+                        c4h = rollup(c1h, 4)
+                    if not len(c1h["close"]) or not len(c4h["close"]):
                         continue
 
-                    try:
-                        result = generate_swing_signal(
-                            symbol=SYMBOL,
-                            c4h=c4h,
-                            c1h=c1h,
-                            c15m=c15,
-                            state=state,
-                        )
-                    except TypeError:
-                        result = generate_swing_signal(
-                            symbol=SYMBOL,
-                            c4h=c4h,
-                            c1h=c1h,
-                            c15m=c15,
-                        )
-
-                    sig, new_state, dbg = _unpack_strategy_result(result)
-                    if new_state:
-                        state = new_state
+                    # advances `state` in place
+                    sig, dbg = generate_swing_signal(
+                        symbol=SYMBOL,
+                        c4h=c4h,
+                        c1h=c1h,
+                        c15m=c15,
+                        state=state,
+                    )
 
                     phase = state.get("phase", "IDLE")
 
@@ -263,6 +350,7 @@ async def swing_loop():
 
 
 def main():
+    _uvloop.install()
     asyncio.run(swing_loop())
 
 
@@ -1,8 +1,9 @@
 import asyncio
 import httpx
 import os
-import json
+import random
 
+from _fastjson import loads as json_loads
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
 from logger import log
 
@@ -10,37 +11,93 @@ from logger import log
 API = "https://api.telegram.org/bot{}/{}"
 
 
+# configured chat id as the string form Telegram ids are compared in; None disables commands
+_ALLOWED_CHAT = str(TELEGRAM_CHAT_ID) if TELEGRAM_CHAT_ID else None
+
+
 def _chat_ok(msg: dict) -> bool:
     """
     Restrict commands to your configured chat.
     """
-    try:
-        return str(msg["chat"]["id"]) == str(TELEGRAM_CHAT_ID)
-    except Exception:
-        return False
+    chat = msg.get("chat")
+    return isinstance(chat, dict) and str(chat.get("id")) == _ALLOWED_CHAT
 
 TELEGRAM_OFFSET_FILE = os.getenv("TELEGRAM_OFFSET_FILE", "telegram_offset.json")
+_last_saved_offset = None
+
+# The offset is written in place as a fixed-width, zero-padded integer through one
+# fd kept open: a single 20-byte pwrite per checkpoint instead of a tmp file + rename.
+_OFFSET_WIDTH = 20
+_offset_fd = None
 
 def load_tg_offset() -> int:
+    """ Last handled update_id (0 if none). The file holds the bare (zero-padded) integer. """
+    try:
+        with open(TELEGRAM_OFFSET_FILE, "rb") as f:
+            raw = f.read().strip()
+    except Exception:
+        return 0
+    try:
+        return int(raw or 0)
+    except ValueError:
+        pass
     try:
-        with open(TELEGRAM_OFFSET_FILE, "r") as f:
-            return int(json.load(f).get("last_update_id", 0))
+        # files written before the plain-integer format: {"last_update_id": N}
+        return int(json_loads(raw).get("last_update_id", 0))
     except Exception:
         return 0
 
 def save_tg_offset(last_update_id: int) -> None:
+    global _last_saved_offset, _offset_fd
+    n = int(last_update_id)
+    if n == _last_saved_offset:
+        return
     try:
-        tmp = TELEGRAM_OFFSET_FILE + ".tmp"
-        with open(tmp, "w") as f:
-            json.dump({"last_update_id": int(last_update_id)}, f)
-        os.replace(tmp, TELEGRAM_OFFSET_FILE)
+        if _offset_fd is None:
+            fd = os.open(TELEGRAM_OFFSET_FILE, os.O_WRONLY | os.O_CREAT, 0o644)
+            # older files (JSON or unpadded) may be longer or shorter than one record
+            os.ftruncate(fd, _OFFSET_WIDTH)
+            _offset_fd = fd
+        os.pwrite(_offset_fd, b"%0*d" % (_OFFSET_WIDTH, n), 0)
+        _last_saved_offset = n
     except Exception:
         pass
 
 
+TG_BACKOFF_MAX = 60.0  # cap (s) for the poll-error delay, doubled per consecutive failure
+
+
+def _retry_after_s(r) -> float | None:
+    """ Delay Telegram asks for on a 429: the Retry-After header, else parameters.retry_after. """
+    try:
+        return float(r.headers["Retry-After"])
+    except (KeyError, ValueError):
+        pass
+    try:
+        return float(json_loads(r.content)["parameters"]["retry_after"])
+    except Exception:
+        return None
+
+
+# commands waiting for the runner; a flood backs up into the poll loop past this
+COMMAND_Q_MAX = 64
+
+
+async def _run_commands(q: asyncio.Queue, on_command):
+    # one at a time, in arrival order: commands change bot state, so they must not interleave
+    while True:
+        text = await q.get()
+        try:
+            await on_command(text)
+        except Exception as e:
+            log({"event": "telegram_command_error", "command": text[:100], "error": str(e)})
+
+
 async def telegram_poll_commands(on_command, poll_error_sleep_s: int = 2):
     """
     Long-poll Telegram updates and call on_command(text) for slash commands.
+    Commands run in order on a separate task, so the next poll is already waiting
+    while one executes.
 
     on_command: async function that accepts a string command, e.g. "/grid_status BTC"
     """
@@ -52,36 +109,61 @@ async def telegram_poll_commands(on_command, poll_error_sleep_s: int = 2):
     offset = (last_id + 1) if last_id else None
     timeout = 30  # long-poll duration
 
-    async with httpx.AsyncClient(timeout=timeout + 10) as client:
+    url = API.format(TELEGRAM_BOT_TOKEN, "getUpdates")
+
+    # the read timeout must outlast the long-poll; a dead route should still fail fast on connect.
+    # Idle keep-alive spans the gap between polls so each one reuses the same TLS connection.
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout + 10, connect=5.0),
+        transport=httpx.AsyncHTTPTransport(
+            retries=2,
+            limits=httpx.Limits(max_keepalive_connections=1, keepalive_expiry=120.0),
+        ),
+    ) as client, asyncio.TaskGroup() as tg:
         log({"event": "telegram_control_started"})
+        commands: asyncio.Queue = asyncio.Queue(COMMAND_Q_MAX)
+        tg.create_task(_run_commands(commands, on_command))
 
+        backoff = poll_error_sleep_s
         while True:
+            retry_after = None
             try:
                 params = {"timeout": timeout}
                 if offset is not None:
                     params["offset"] = offset
 
-                url = API.format(TELEGRAM_BOT_TOKEN, "getUpdates")
                 r = await client.get(url, params=params)
+                if r.status_code == 429:
+                    retry_after = _retry_after_s(r)
                 r.raise_for_status()
-                data = r.json()
+                data = json_loads(r.content)
+                backoff = poll_error_sleep_s
 
-                for upd in data.get("result", []):
-                    offset = upd["update_id"] + 1
-                    save_tg_offset(upd["update_id"])
+                updates = data.get("result", [])
+                if updates:
+                    # one checkpoint per batch, written before any command runs: a restart
+                    # mid-batch skips the rest instead of replaying commands already handled
+                    offset = updates[-1]["update_id"] + 1
+                    save_tg_offset(offset - 1)
 
+                for upd in updates:
                     msg = upd.get("message") or upd.get("edited_message")
                     if not msg:
                         continue
-                    if not _chat_ok(msg):
-                        continue
 
+                    # most updates aren't commands: reject those before the chat check
                     text = (msg.get("text") or "").strip()
                     if not text.startswith("/"):
                         continue
+                    if not _chat_ok(msg):
+                        continue
 
-                    await on_command(text)
+                    await commands.put(text)
 
             except Exception as e:
-                log({"event": "telegram_control_error", "error": str(e)})
-                await asyncio.sleep(poll_error_sleep_s)
+                # Telegram's own delay on 429; otherwise capped exponential backoff with
+                # +-25% jitter so a flapping link (or several bots) doesn't retry in lockstep
+                delay = retry_after if retry_after is not None else backoff * random.uniform(0.75, 1.25)
+                log({"event": "telegram_control_error", "error": str(e), "retry_in_s": round(delay, 2)})
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, TG_BACKOFF_MAX)
@@ -1,19 +1,71 @@
 # trade_events.py
+import atexit
 import os
-import json
+import sys
+import threading
+import time
 import uuid
-from datetime import datetime, timezone
+
+from _fastjson import dumps as json_dumps
 
 _TRADES_DIR = os.getenv("TRADES_DIR", "trades")
 
+# When appended events are fsynced:
+#   always   - every append_events() call (default)
+#   interval - by a background thread every TRADES_FSYNC_S, plus at exit; a crash
+#              can lose up to that much
+#   never    - left to the OS page cache; synced only when a file is closed at
+#              day rollover and at exit
+# "At exit" is the atexit hook: it runs on a normal exit, and on SIGTERM (systemd
+# stop/restart) only in processes that call _shutdown.install(), as signalbot does.
+# Anything else falls back to "always" (with a warning) so a typo never drops durability.
+_FSYNC_MODES = ("always", "interval", "never")
+TRADES_FSYNC = os.getenv("TRADES_FSYNC", "always")
+if TRADES_FSYNC not in _FSYNC_MODES:
+    print(f"[trade_events] unknown TRADES_FSYNC={TRADES_FSYNC!r} (expected one of {', '.join(_FSYNC_MODES)}); using 'always'", file=sys.stderr)
+    TRADES_FSYNC = "always"
+TRADES_FSYNC_S = float(os.getenv("TRADES_FSYNC_S", "1.0"))
+
+# Raw append fds: events are already encoded bytes, so each batch is one write()
+# with no buffered-IO layer. In "always" mode the fd is O_DSYNC where the OS has it,
+# which makes that write durable without a separate fsync.
+_O_DSYNC = getattr(os, "O_DSYNC", 0)
+
+# Appends only need their data (and the size that reaches it) durable, not mtime:
+# fdatasync skips that metadata commit where the OS has it.
+_fsync = getattr(os, "fdatasync", os.fsync)
+
+# symbol -> (UTC day number, append fd); reopened when the day rolls over.
+# The bot appends from its event-writer thread and, on some paths, from the loop
+# thread, so writes go through one lock.
+_handles: dict = {}
+_unsynced: set = set()
+_lock = threading.Lock()
+_syncer = None
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") for the latest stamp: events in the same
+# second only format their microseconds. One tuple so threads never see a torn pair.
+_iso_cache = (None, "")
+
 def _utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    global _iso_cache
+    sec, us = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_sec, prefix = _iso_cache
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _iso_cache = (sec, prefix)
+    return f"{prefix}.{us:06d}+00:00"
 
 def _day_key_utc() -> str:
-    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+_dir_ready = False
 
 def ensure_trades_dir():
-    os.makedirs(_TRADES_DIR, exist_ok=True)
+    global _dir_ready
+    if not _dir_ready:
+        os.makedirs(_TRADES_DIR, exist_ok=True)
+        _dir_ready = True
 
 def new_trade_id() -> str:
     # short, readable, unique enough
@@ -33,17 +85,96 @@ def append_event(symbol: str, event: dict):
     Append one JSON object per line.
     Safe for a single-process per symbol systemd setup.
     """
-    event = dict(event)  # copy
-    event.setdefault("ts_utc", _utc_now_iso())
+    append_events(symbol, [event])
+
+def _event_line(symbol: str, event: dict, owned: bool = False) -> bytes:
+    if not owned:
+        event = dict(event)  # copy: the caller's dict stays as it was
+    if "ts_utc" not in event:
+        event["ts_utc"] = _utc_now_iso()
     event.setdefault("symbol", symbol)
     event["strategy"] = os.getenv("STRATEGY", "")
     event["trading_mode"] = os.getenv("TRADING_MODE", "")
     event["service"] = os.getenv("SERVICE_NAME", "")
+    return json_dumps(event)
+
+def _handle(symbol: str) -> int:
+    # the UTC day number decides whether the open fd is still today's file: no
+    # datetime/strftime or path join unless it rolled over
+    day = int(time.time()) // 86400
+    cur = _handles.get(symbol)
+    if cur is not None and cur[0] == day:
+        return cur[1]
+    if cur is not None:
+        _close(cur[1])
+    day_key = time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+    path = os.path.join(_TRADES_DIR, f"{symbol}-{day_key}.jsonl")
+    ensure_trades_dir()
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    if TRADES_FSYNC == "always":
+        flags |= _O_DSYNC
+    fd = os.open(path, flags, 0o644)
+    _handles[symbol] = (day, fd)
+    return fd
+
+
+def _close(fd: int):
+    if fd in _unsynced:
+        _unsynced.discard(fd)
+        _fsync(fd)
+    os.close(fd)
+
+
+def _sync_pending():
+    for fd in _unsynced:
+        _fsync(fd)
+    _unsynced.clear()
+
+
+def flush_all():
+    """fsync every event appended since its file's last sync (interval and never modes)."""
+    with _lock:
+        _sync_pending()
+
+
+atexit.register(flush_all)
+
+
+def _sync_loop():
+    while True:
+        time.sleep(TRADES_FSYNC_S)
+        try:
+            flush_all()
+        except OSError:
+            pass  # keep syncing later batches; a failing disk also fails the writes
+
+
+def _start_syncer():
+    # interval mode only; started by the first append so importing stays side-effect free
+    global _syncer
+    _syncer = threading.Thread(target=_sync_loop, name="trade-events-fsync", daemon=True)
+    _syncer.start()
+
+
+def append_events(symbol: str, events: list, owned: bool = False):
+    """
+    Append several events with a single write, synced per TRADES_FSYNC.
+    owned=True: the dicts were built for this call and aren't used afterwards, so
+    they are tagged in place instead of copied first.
+    """
+    if not events:
+        return
+    data = b"\n".join([_event_line(symbol, e, owned) for e in events]) + b"\n"
 
-    path = trade_file_path(symbol)
-    line = json.dumps(event, separators=(",", ":"), ensure_ascii=False)
-    
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
-        f.flush()
-        os.fsync(f.fileno())
+    with _lock:
+        fd = _handle(symbol)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if TRADES_FSYNC == "always":
+            if not _O_DSYNC:
+                _fsync(fd)
+        else:
+            _unsynced.add(fd)
+            if TRADES_FSYNC == "interval" and _syncer is None:
+                _start_syncer()
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import deque
+
+
+class FrameBatch:
+    """
+    Drain a websocket in batches.
+
+    A reader task pulls frames off the socket as soon as they arrive, stamps
+    them with time.time_ns() and parks them in a bounded deque (oldest frames
+    are dropped if the consumer falls that far behind). get_batch() hands over
+    everything pending at once, so a burst is parsed in one go and per-bar
+    logic runs once per batch instead of once per frame.
+
+    The reader ends by itself once the socket closes, so it needs no cleanup
+    beyond leaving the websocket context.
+    """
+    def __init__(self, ws, maxlen: int = 256):
+        self._ws = ws
+        self._frames = deque(maxlen=maxlen)
+        self._exc = None
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self._task = asyncio.create_task(self._reader())
+
+    async def _reader(self):
+        frames = self._frames
+        try:
+            while True:
+                frame = await self._ws.recv(decode=False)
+                if len(frames) == frames.maxlen:
+                    self.dropped += 1
+                frames.append((time.time_ns(), frame))
+                self._ready.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # surface disconnects to the consumer so its reconnect path runs
+            self._exc = e
+            self._ready.set()
+
+    async def get_batch(self) -> list[tuple[int, bytes]]:
+        """All pending (recv_ts_ns, frame) pairs, oldest first; waits if there are none."""
+        await self._ready.wait()
+        if not self._frames:
+            raise self._exc
+        batch = list(self._frames)
+        self._frames.clear()
+        if self._exc is None:
+            self._ready.clear()
+        return batch
+
+
+ALL_MIDS_TAG = b'"channel":"allMids"'
+
+
+def mid_needle(symbol: str) -> bytes:
+    """Byte pattern that opens `symbol`'s entry in an allMids payload."""
+    return f'"{symbol}":"'.encode()
+
+
+def all_mids_price(frame: bytes, needle: bytes) -> bytes | None:
+    """
+    The raw mid (e.g. b"64012.5") for one coin in an allMids frame, or None.
+
+    allMids carries every listed coin, so a full parse builds a dict of
+    hundreds of entries to read one of them. Instead the frame is scanned for
+    the coin's key and the quoted value is sliced out; frames from other
+    channels (subscription acks, pongs) or without the coin are rejected
+    without any parsing. float() accepts the bytes directly.
+    """
+    if ALL_MIDS_TAG not in frame:
+        return None
+    i = frame.find(needle)
+    if i < 0:
+        return None
+    i += len(needle)
+    j = frame.find(b'"', i)
+    return frame[i:j] if j > i else None